@@ -0,0 +1,38 @@
+"""
+Microbenchmark: _norm_text (translate fast path) vs the original NFKD version.
+
+Run from the project root:  python -m bench.bench_norm_text
+"""
+
+import os
+import timeit
+
+from data.uber_loader import _norm_text
+from tests.test_norm_text import _norm_text_nfkd
+
+CORPUS = os.path.join(os.path.dirname(__file__), os.pardir, "tests", "dados", "linhas_recibo.txt")
+REPETICOES = 20
+
+
+def main() -> None:
+    with open(CORPUS, encoding="utf-8") as f:
+        linhas = f.read().splitlines()
+    # Em torno de 1500 linhas, a ordem de grandeza de uma pasta com 100 recibos.
+    linhas = linhas * (1500 // len(linhas) + 1)
+    # Separa as linhas ASCII, as com letras acentuadas e as com outros simbolos (bullets, tracos, ordinais).
+    grupos = {
+        "todas": linhas,
+        "ascii": [l for l in linhas if l.isascii()],
+        "acentos": [l for l in linhas if not l.isascii() and all(c.isascii() or c.isalpha() for c in l)],
+        "simbolos": [l for l in linhas if any(not c.isascii() and not c.isalpha() for c in l)],
+    }
+    for grupo, amostra in grupos.items():
+        if not amostra:
+            continue
+        for nome, funcao in (("nfkd", _norm_text_nfkd), ("translate", _norm_text)):
+            segundos = min(timeit.repeat(lambda: [funcao(l) for l in amostra], number=REPETICOES, repeat=5))
+            print(f"{grupo:9s} {nome:10s} {segundos:.4f}s  ({REPETICOES} x {len(amostra)} linhas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Memory per receipt: dict records (old loader output) vs slotted Recibo.
+
+Run from the project root:  python -m bench.bench_recibo_memoria
+"""
+
+import gc
+import tracemalloc
+
+from data.uber_recibo import PontoViagem, Recibo
+
+N = 20000
+
+
+def _dados(i: int) -> dict:
+    # Textos criados por recibo, como saem do parser (sem internar).
+    return {
+        "arquivo": f"recibo_{i:05d}.pdf",
+        "data_texto": f"{i % 28 + 1} de março de 2025",
+        "hora": f"{i % 24:02d}:{i % 60:02d}",
+        "data_yyyymmdd": f"202503{i % 28 + 1:02d}",
+        "total": 25.9 + i,
+        "preco_viagem": 20.0 + i,
+        "taxa_intermediacao": 3.0,
+        "custo_fixo": 2.9,
+        "promocao": None,
+        "pagamento_linha": "Visa ••••" + str(1234),
+        "categoria": "Uber" + "X",
+        "distancia_km": str(5.2),
+        "duracao_min": str(18),
+        "origem": {"hora": "14:35", "endereco": f"Rua A, {i}"},
+        "destino": {"hora": "14:53", "endereco": f"Rua B, {i}"},
+        "layout": "uber_2024",
+    }
+
+
+def _como_dict(i: int) -> dict:
+    return _dados(i)
+
+
+def _como_recibo(i: int) -> Recibo:
+    return Recibo.from_dict(_dados(i))
+
+
+def _bytes_por_recibo(fabrica) -> float:
+    gc.collect()
+    tracemalloc.start()
+    registros = [fabrica(i) for i in range(N)]
+    atual, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del registros
+    return atual / N
+
+
+def main() -> None:
+    assert isinstance(_como_recibo(0).origem, PontoViagem)
+    antes = _bytes_por_recibo(_como_dict)
+    depois = _bytes_por_recibo(_como_recibo)
+    print(f"dict    {antes:8.0f} bytes/recibo")
+    print(f"Recibo  {depois:8.0f} bytes/recibo  ({1 - depois / antes:.0%} menos, {N} recibos)")
+
+
+if __name__ == "__main__":
+    main()
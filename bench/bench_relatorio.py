@@ -0,0 +1,56 @@
+"""
+Build time and PDF size of criar_relatorio_uber per renderer.
+
+Run from the project root:  python -m bench.bench_relatorio [N ...]
+(default: 1000 and 10000 synthetic receipts).
+"""
+
+import sys
+import time
+
+from pdf.uber_builder import RENDERIZADORES, criar_relatorio_uber
+
+
+def _recibos(n: int) -> list:
+    recibos = []
+    for i in range(n):
+        mes = i % 12 + 1
+        dia = i % 28 + 1
+        recibos.append(
+            {
+                "arquivo": f"recibo_{i:05d}.pdf",
+                "data_texto": f"{dia} de março de 2025",
+                "hora": f"{i % 24:02d}:{i % 60:02d}",
+                "data_yyyymmdd": f"2025{mes:02d}{dia:02d}",
+                "total": 25.9 + i % 50,
+                "preco_viagem": 20.0 + i % 50,
+                "taxa_intermediacao": 3.0,
+                "custo_fixo": 2.9,
+                "promocao": 5.0 if i % 7 == 0 else None,
+                "pagamento_linha": "Visa ••••1234",
+                "categoria": "UberX",
+                "distancia_km": "5.2",
+                "duracao_min": "18",
+                "origem": {"hora": "14:35", "endereco": f"Rua Augusta, {i} - Consolação, São Paulo - SP"},
+                "destino": {"hora": "14:53", "endereco": f"Av. Brigadeiro Faria Lima, {i} - Itaim Bibi"},
+            }
+        )
+    return recibos
+
+
+def main() -> None:
+    tamanhos = [int(a) for a in sys.argv[1:]] or [1000, 10000]
+    print(f"{'recibos':>8s}  " + "  ".join(f"{nome:>20s}" for nome in RENDERIZADORES))
+    for n in tamanhos:
+        recibos = _recibos(n)
+        colunas = []
+        for renderizador in RENDERIZADORES:
+            inicio = time.perf_counter()
+            pdf = criar_relatorio_uber(recibos, renderizador=renderizador)
+            segundos = time.perf_counter() - inicio
+            colunas.append(f"{segundos:7.2f} s, {len(pdf) / 1e6:5.2f} MB")
+        print(f"{n:8d}  " + "  ".join(f"{c:>20s}" for c in colunas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Asyncio front-end for the Uber receipt loader.
+Keeps folder walking and PDF parsing off the event loop.
+"""
+
+from __future__ import annotations
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import AsyncIterator, List, Optional
+
+from data.uber_loader import iter_recibos_pasta
+from data.uber_recibo import Recibo
+
+# Marca o fim da leitura na fila entre a thread de leitura e o event loop.
+_FIM = object()
+
+
+async def iter_recibos_pasta_async(
+    pasta_path: str,
+    workers: Optional[int] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    fila: Optional[int] = None,
+    **opcoes,
+) -> AsyncIterator[Recibo]:
+    """Async iterator over the receipts of a folder (see iter_recibos_pasta).
+
+    iter_recibos_pasta runs in `executor`, which must be a thread pool (the
+    loop's default one by default); the reader is a closure and cannot be
+    sent to a process pool, so a ProcessPoolExecutor raises TypeError. With
+    `workers` > 1 the PDFs themselves are parsed in worker processes, with
+    at most `workers` files being parsed at once. At most `fila`
+    parsed receipts (2 x `workers` by default) wait for the consumer before
+    reading pauses. Closing the iterator (use contextlib.aclosing so that a
+    cancelled consumer closes it too) stops the walk within one file or
+    INTERVALO_PARAR_S, cancels pending files without waiting for the ones
+    being parsed and waits for the cache and log to be flushed. Other keyword arguments go to
+    iter_recibos_pasta.
+    """
+    if isinstance(executor, ProcessPoolExecutor):
+        raise TypeError("executor deve ser um pool de threads (ex.: ThreadPoolExecutor)")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    loop = asyncio.get_running_loop()
+    saida: asyncio.Queue = asyncio.Queue()
+    vagas = threading.Semaphore(fila or workers * 2)
+    parar = threading.Event()
+
+    def _entregar(item: object) -> None:
+        loop.call_soon_threadsafe(saida.put_nowait, item)
+
+    def _ler() -> None:
+        # `parar` tambem e consultado dentro do loader, entre arquivos e durante a espera.
+        recibos = iter_recibos_pasta(pasta_path, workers=workers, parar=parar.is_set, **opcoes)
+        try:
+            for recibo in recibos:
+                # Consumidor lento: espera vaga na fila, mas sem perder um cancelamento.
+                while not vagas.acquire(timeout=0.1):
+                    if parar.is_set():
+                        return
+                if parar.is_set():
+                    return
+                _entregar(recibo)
+        finally:
+            recibos.close()
+            _entregar(_FIM)
+
+    leitura = loop.run_in_executor(executor, _ler)
+    try:
+        while True:
+            recibo = await saida.get()
+            if recibo is _FIM:
+                break
+            vagas.release()
+            yield recibo
+        await leitura
+    finally:
+        parar.set()
+        if not leitura.done():
+            await asyncio.wait([leitura])
+
+
+async def carregar_recibos_pasta_async(
+    pasta_path: str,
+    workers: Optional[int] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    **opcoes,
+) -> List[Recibo]:
+    """Load every receipt of the folder without blocking the event loop."""
+    return [
+        recibo
+        async for recibo in iter_recibos_pasta_async(pasta_path, workers=workers, executor=executor, **opcoes)
+    ]
@@ -0,0 +1,233 @@
+"""
+Persistent parse cache for Uber receipts.
+Entries are keyed by the PDF SHA-256 plus a parser version stamp.
+A manifest keyed by (path, size, mtime_ns) records the outcome of each
+file (receipts, rejections, failures) so unchanged files are skipped
+without reading them. Repeating texts (category, payment,
+addresses) are stored once in a shared `textos` table and referenced by id.
+Small run settings (the backend picked by backend="auto") live in `escolhas`.
+"""
+
+from __future__ import annotations
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Campos de texto que se repetem entre recibos (gravados como id da tabela textos).
+CAMPOS_TEXTO = ("categoria", "pagamento_linha")
+CAMPOS_PONTO = ("origem", "destino")
+
+
+class ReciboCache:
+    """SQLite-backed cache shared safely by concurrent runs (WAL mode)."""
+
+    def __init__(self, diretorio: str, nome_arquivo: str = "recibos.sqlite3"):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, nome_arquivo)
+        self.hits = 0
+        self.misses = 0
+        self.manifesto_hits = 0
+        self.manifesto_misses = 0
+        self._texto_por_id: Dict[int, str] = {}
+        self._id_por_texto: Dict[str, int] = {}
+        # Ids criados na transacao corrente; so entram nos mapas depois do commit.
+        self._ids_novos: Dict[str, int] = {}
+        # Pode ser usada de outra thread (ex.: carregar_recibos_pasta_async), nunca de duas ao mesmo tempo.
+        self._conn = sqlite3.connect(self.caminho, timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS recibos ("
+            " sha256 TEXT NOT NULL,"
+            " versao TEXT NOT NULL,"
+            " dados TEXT NOT NULL,"
+            " PRIMARY KEY (sha256, versao))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS manifesto ("
+            " caminho TEXT PRIMARY KEY,"
+            " tamanho INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " versao TEXT NOT NULL,"
+            " dados TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS textos ("
+            " id INTEGER PRIMARY KEY,"
+            " valor TEXT NOT NULL UNIQUE)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS escolhas ("
+            " chave TEXT PRIMARY KEY,"
+            " valor TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _id_texto(self, valor: str) -> int:
+        tid = self._id_por_texto.get(valor)
+        if tid is None:
+            tid = self._ids_novos.get(valor)
+        if tid is None:
+            # Ids nunca mudam depois de commitados, entao o mapa em memoria e seguro
+            # mesmo com outros processos gravando no mesmo banco.
+            self._conn.execute("INSERT OR IGNORE INTO textos (valor) VALUES (?)", (valor,))
+            tid = self._conn.execute("SELECT id FROM textos WHERE valor = ?", (valor,)).fetchone()[0]
+            self._ids_novos[valor] = tid
+        return tid
+
+    @contextmanager
+    def _transacao(self) -> Iterator[None]:
+        """Commit (or roll back), then publish the text ids created inside."""
+        try:
+            with self._conn:
+                yield
+        except BaseException:
+            # Depois do rollback o id pode ir para outro texto: descarta.
+            self._ids_novos.clear()
+            raise
+        for valor, tid in self._ids_novos.items():
+            self._id_por_texto[valor] = tid
+            self._texto_por_id[tid] = valor
+        self._ids_novos.clear()
+
+    def _texto(self, tid: int) -> str:
+        valor = self._texto_por_id.get(tid)
+        if valor is None:
+            valor = self._conn.execute("SELECT valor FROM textos WHERE id = ?", (tid,)).fetchone()[0]
+            self._texto_por_id[tid] = valor
+            self._id_por_texto[valor] = tid
+        return valor
+
+    def _codificar(self, recibo: Dict) -> Dict:
+        dados = dict(recibo)
+        for nome in CAMPOS_TEXTO:
+            if isinstance(dados.get(nome), str):
+                dados[nome] = self._id_texto(dados[nome])
+        for nome in CAMPOS_PONTO:
+            ponto = dados.get(nome)
+            if ponto:
+                dados[nome] = {k: self._id_texto(v) if isinstance(v, str) else v for k, v in ponto.items()}
+        return dados
+
+    def _decodificar(self, dados: Dict) -> Dict:
+        # Entradas antigas (texto puro) continuam validas: so ints sao traduzidos.
+        for nome in CAMPOS_TEXTO:
+            if isinstance(dados.get(nome), int):
+                dados[nome] = self._texto(dados[nome])
+        for nome in CAMPOS_PONTO:
+            ponto = dados.get(nome)
+            if ponto:
+                dados[nome] = {k: self._texto(v) if isinstance(v, int) else v for k, v in ponto.items()}
+        return dados
+
+    def get(self, sha256: str, versao: str) -> Optional[Dict]:
+        row = self._conn.execute(
+            "SELECT dados FROM recibos WHERE sha256 = ? AND versao = ?",
+            (sha256, versao),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._decodificar(json.loads(row[0]))
+
+    def put(self, sha256: str, versao: str, recibo: Dict) -> None:
+        self.put_many([(sha256, versao, recibo)])
+
+    def put_many(self, entradas: Iterable[Tuple[str, str, Dict]]) -> None:
+        entradas = list(entradas)
+        if not entradas:
+            return
+        with self._transacao():
+            rows = [
+                (sha, versao, json.dumps(self._codificar(recibo), ensure_ascii=False))
+                for sha, versao, recibo in entradas
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO recibos (sha256, versao, dados) VALUES (?, ?, ?)",
+                rows,
+            )
+
+    def _codificar_item(self, item: Dict) -> Dict:
+        if item.get("recibo") is None:
+            return item
+        return {**item, "recibo": self._codificar(item["recibo"])}
+
+    def _decodificar_item(self, item: Dict) -> Dict:
+        if item.get("recibo") is not None:
+            item["recibo"] = self._decodificar(item["recibo"])
+        return item
+
+    def get_manifesto(self, caminho: str, tamanho: int, mtime_ns: int, versao: str) -> Optional[List[Dict]]:
+        """Return the outcomes recorded for an unchanged file, else None.
+
+        One entry per PDF of the file (one for a plain PDF, one per member of
+        an archive), in order: {"arquivo", "status", "erro", "mensagem",
+        "recibo"}, where "recibo" is the receipt dict or None.
+        """
+        row = self._conn.execute(
+            "SELECT tamanho, mtime_ns, versao, dados FROM manifesto WHERE caminho = ?",
+            (caminho,),
+        ).fetchone()
+        if row is None or tuple(row[:3]) != (tamanho, mtime_ns, versao):
+            self.manifesto_misses += 1
+            return None
+        self.manifesto_hits += 1
+        dados = json.loads(row[3])
+        if isinstance(dados, list):
+            # Formato antigo: so a lista de recibos.
+            return [
+                {"arquivo": r.get("arquivo"), "status": "ok", "erro": None, "mensagem": None, "recibo": self._decodificar(r)}
+                for r in dados
+            ]
+        return [self._decodificar_item(item) for item in dados["itens"]]
+
+    def put_manifesto_many(self, entradas: Iterable[Tuple[str, int, int, str, List[Dict]]]) -> None:
+        """Store (path, size, mtime_ns, version, outcomes); see get_manifesto."""
+        entradas = list(entradas)
+        if not entradas:
+            return
+        with self._transacao():
+            rows = [
+                (
+                    caminho,
+                    tamanho,
+                    mtime_ns,
+                    versao,
+                    json.dumps({"itens": [self._codificar_item(item) for item in itens]}, ensure_ascii=False),
+                )
+                for caminho, tamanho, mtime_ns, versao, itens in entradas
+            ]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifesto (caminho, tamanho, mtime_ns, versao, dados)"
+                " VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def get_escolha(self, chave: str) -> Optional[str]:
+        """Value stored with put_escolha (e.g. the backend picked for a folder), else None."""
+        row = self._conn.execute("SELECT valor FROM escolhas WHERE chave = ?", (chave,)).fetchone()
+        return row[0] if row is not None else None
+
+    def put_escolha(self, chave: str, valor: str) -> None:
+        with self._transacao():
+            self._conn.execute("INSERT OR REPLACE INTO escolhas (chave, valor) VALUES (?, ?)", (chave, valor))
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "manifesto_hits": self.manifesto_hits,
+            "manifesto_misses": self.manifesto_misses,
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def __enter__(self) -> "ReciboCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -4,20 +4,70 @@ Extracts key fields from text for reporting.
 """
 
 from __future__ import annotations
+import hashlib
+import io
+import itertools
+import json
+import mmap
+import multiprocessing
+import posixpath
+import queue
 import re
+import signal
+import tarfile
+import threading
+import time
 import unicodedata
-from typing import Dict, List, Optional
+import zipfile
+import zlib
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from functools import partial
+from typing import BinaryIO, Callable, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 import os
-from pypdf import PdfReader
+from pypdf import PageObject, PdfReader
+from data.uber_cache import ReciboCache
+from data.uber_recibo import DicionarioTextos, PontoViagem, Recibo, ResultadoArquivo
+
+try:
+    import resource
+except ImportError:  # Windows: sem limite de memoria por worker
+    resource = None
+
+# Incrementar sempre que a saida de carregar_recibo_uber mudar (invalida o cache).
+PARSER_VERSION = "2"
+
+# Limite de paginas lidas por recibo (protege contra PDFs enormes).
+MAX_PAGINAS = 20
+
+
+class _TabelaNorm(dict):
+    """str.translate table: each character -> its NFKD form without combining marks.
+
+    Filled lazily, one entry per distinct character seen. NFKD decomposes
+    character by character and the combining marks (the only characters
+    canonical reordering moves) are dropped, so translating with this table
+    gives the same text as normalizing the whole string.
+    """
+
+    def __missing__(self, code: int) -> str:
+        base = "".join(c for c in unicodedata.normalize("NFKD", chr(code)) if not unicodedata.combining(c))
+        base = base.replace("\ufffd", "")
+        self[code] = base
+        return base
+
+
+_TABELA_NORM = _TabelaNorm()
 
 
 def _norm_text(value: str) -> str:
-    value = unicodedata.normalize("NFKD", str(value))
-    value = "".join(c for c in value if not unicodedata.combining(c))
-    value = value.replace("\ufffd", "")
-    value = value.lower()
-    value = re.sub(r"\s+", " ", value)
-    return value.strip()
+    value = str(value)
+    if not value.isascii():
+        value = value.translate(_TABELA_NORM)
+    return " ".join(value.lower().split())
 
 
 def _clean_text(value: str) -> str:
@@ -52,19 +102,6 @@ def _extract_currency_from_line(line: str) -> Optional[float]:
     return _parse_currency(line)
 
 
-def _find_value_after_keyword(lines: List[str], key: str) -> Optional[float]:
-    for i, line in enumerate(lines):
-        if key in _norm_text(line):
-            value = _extract_currency_from_line(line)
-            if value is not None:
-                return value
-            if i + 1 < len(lines):
-                value = _extract_currency_from_line(lines[i + 1])
-                if value is not None:
-                    return value
-    return None
-
-
 def _parse_date_pt(date_text: str) -> Optional[str]:
     """Return date as YYYYMMDD if possible."""
     months = {
@@ -93,108 +130,1533 @@ def _parse_date_pt(date_text: str) -> Optional[str]:
     return f"{year}{mon}{day}"
 
 
-def carregar_recibo_uber(pdf_path: str) -> Dict:
-    reader = PdfReader(pdf_path)
-    text = "\n".join(page.extract_text() or "" for page in reader.pages)
-    lines = [_clean_text(line) for line in text.splitlines() if _clean_text(line)]
+class NaoEhReciboUber(ValueError):
+    """Raised by the pre-filter for PDFs (or non-PDFs) that are not Uber receipts."""
 
-    # Data e hora (topo)
-    data_str = None
-    hora_str = None
-    for i, line in enumerate(lines):
-        if re.match(r"^\d{1,2} de ", _norm_text(line)) and " de " in _norm_text(line):
-            data_str = _clean_text(line)
-            if i + 1 < len(lines) and re.match(r"^\d{1,2}:\d{2}$", lines[i + 1]):
-                hora_str = _clean_text(lines[i + 1])
-            break
 
-    # Totais e itens
-    total = _find_value_after_keyword(lines, "total")
-    preco_viagem = _find_value_after_keyword(lines, "preco da viagem")
-    taxa_inter = _find_value_after_keyword(lines, "taxa de intermediacao")
-    custo_fixo = _find_value_after_keyword(lines, "custo fixo")
-    promocao = _find_value_after_keyword(lines, "promocao")
+ReciboFonte = Union[str, "os.PathLike[str]", bytes, bytearray, memoryview, BinaryIO]
 
-    # Pagamentos
-    pagamento_linha = None
-    for i, line in enumerate(lines):
-        if _norm_text(line) == "pagamentos":
-            if i + 1 < len(lines):
-                pagamento_linha = _clean_text(lines[i + 1])
-            break
 
+@contextmanager
+def _abrir_buffer(fonte: ReciboFonte) -> Iterator[Union[bytes, bytearray, memoryview, mmap.mmap]]:
+    """Expose the PDF as a single buffer; paths are memory-mapped read-only."""
+    if isinstance(fonte, (bytes, bytearray, memoryview)):
+        yield fonte
+        return
+    if isinstance(fonte, (str, os.PathLike)):
+        with open(fonte, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                yield buffer
+            finally:
+                buffer.close()
+        return
+    yield fonte.read()
+
+
+def _stream_buffer(buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> BinaryIO:
+    if isinstance(buffer, mmap.mmap):
+        buffer.seek(0)
+        return buffer
+    return io.BytesIO(buffer)
+
+
+def _nome_fonte(fonte: ReciboFonte) -> Optional[str]:
+    if isinstance(fonte, (str, os.PathLike)):
+        return os.path.basename(fonte)
+    nome = getattr(fonte, "name", None)
+    return os.path.basename(nome) if isinstance(nome, str) else None
+
+
+class BackendTexto(ABC):
+    """Text-extraction backend: turns one pypdf page into its text lines."""
+
+    nome = "base"
+
+    @abstractmethod
+    def texto_pagina(self, page: PageObject) -> str:
+        ...
+
+
+class BackendPypdf(BackendTexto):
+    """pypdf's extract_text (full layout reconstruction)."""
+
+    nome = "pypdf"
+
+    def texto_pagina(self, page: PageObject) -> str:
+        return page.extract_text() or ""
+
+
+class _FonteNaoSuportada(Exception):
+    pass
+
+
+_TOKEN_RE = re.compile(
+    rb"""
+    (?P<lit>\((?:\\.|[^\\()]|\((?:\\.|[^\\()])*\))*\))
+  | (?P<hex><[0-9A-Fa-f\s]*>)
+  | (?P<dict><<|>>)
+  | (?P<arr>[\[\]])
+  | (?P<name>/[^\s/\[\]()<>{}%]*)
+  | (?P<num>[+-]?(?:\d+\.?\d*|\.\d+))
+  | (?P<comment>%[^\r\n]*)
+  | (?P<op>[A-Za-z'"*][A-Za-z0-9'"*]*)
+    """,
+    re.S | re.X,
+)
+_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+_ESCAPE_RE = re.compile(rb"\\([0-7]{1,3}|\r\n|.)", re.S)
+_CODECS_FONTE = {"/WinAnsiEncoding": "cp1252", "/MacRomanEncoding": "mac_roman"}
+
+
+def _bytes_literal(token: bytes) -> bytes:
+    def _escape(m: "re.Match[bytes]") -> bytes:
+        seq = m.group(1)
+        if seq[:1].isdigit():
+            return bytes([int(seq, 8) & 0xFF])
+        if seq in (b"\n", b"\r", b"\r\n"):
+            return b""
+        return _ESCAPES.get(seq, seq)
+    return _ESCAPE_RE.sub(_escape, token[1:-1])
+
+
+def _codec_fonte(fonte) -> str:
+    fonte = fonte.get_object()
+    if fonte.get("/Subtype") not in ("/Type1", "/TrueType", "/MMType1") or "/ToUnicode" in fonte:
+        raise _FonteNaoSuportada(fonte.get("/BaseFont"))
+    if fonte.get("/BaseFont") in ("/Symbol", "/ZapfDingbats"):
+        raise _FonteNaoSuportada(fonte.get("/BaseFont"))
+    encoding = fonte.get("/Encoding")
+    if encoding is not None and not isinstance(encoding, str):
+        raise _FonteNaoSuportada(fonte.get("/BaseFont"))
+    return _CODECS_FONTE.get(encoding, "latin-1")
+
+
+class BackendConteudo(BackendTexto):
+    """Decodes the page content stream's text-showing operators directly.
+
+    Skips pypdf's layout reconstruction: a new line starts whenever the text
+    position moves vertically (Tm/Td/TD/T*/'/"). Pages using fonts it cannot
+    decode with a simple 8-bit encoding (Type0, ToUnicode, Differences) or
+    form XObjects fall back to pypdf's extract_text.
+    """
+
+    nome = "conteudo"
+
+    def texto_pagina(self, page: PageObject) -> str:
+        try:
+            return self._texto_conteudo(page)
+        except _FonteNaoSuportada:
+            return page.extract_text() or ""
+
+    def _texto_conteudo(self, page: PageObject) -> str:
+        conteudo = page.get_contents()
+        if conteudo is None:
+            return ""
+        data = conteudo.get_data()
+        recursos = page.get("/Resources")
+        recursos = recursos.get_object() if recursos is not None else {}
+        fontes = recursos.get("/Font")
+        fontes = fontes.get_object() if fontes is not None else {}
+        xobjects = recursos.get("/XObject")
+        xobjects = xobjects.get_object() if xobjects is not None else {}
+
+        linhas: List[str] = []
+        atual: List[str] = []
+        codecs: Dict[str, str] = {}
+        codec = "latin-1"
+        operandos: List[object] = []
+        pilha: List[List[object]] = []
+        y = 0.0
+        y_linha = 0.0
+        y_texto: Optional[float] = None
+
+        def _quebra() -> None:
+            if atual:
+                linhas.append("".join(atual))
+                atual.clear()
+
+        def _mostrar(valor: bytes) -> None:
+            nonlocal y_texto
+            if y_texto is not None and abs(y - y_texto) > 0.5:
+                _quebra()
+            y_texto = y
+            atual.append(valor.decode(codec, errors="replace"))
+
+        pos = 0
+        while True:
+            m = _TOKEN_RE.search(data, pos)
+            if m is None:
+                break
+            pos = m.end()
+            tipo = m.lastgroup
+            token = m.group()
+            alvo = pilha[-1] if pilha else operandos
+            if tipo == "lit":
+                alvo.append(_bytes_literal(token))
+            elif tipo == "hex":
+                hexa = re.sub(rb"\s", b"", token[1:-1])
+                alvo.append(bytes.fromhex((hexa + b"0" * (len(hexa) % 2)).decode("ascii")))
+            elif tipo == "num":
+                alvo.append(float(token))
+            elif tipo == "name":
+                alvo.append(token.decode("latin-1"))
+            elif tipo == "arr":
+                if token == b"[":
+                    pilha.append([])
+                elif pilha:
+                    arr = pilha.pop()
+                    (pilha[-1] if pilha else operandos).append(arr)
+            elif tipo == "op":
+                if pilha:
+                    continue
+                if token == b"ID":
+                    # Imagem inline: pula os dados binarios ate EI.
+                    fim = data.find(b"EI", pos)
+                    pos = len(data) if fim < 0 else fim + 2
+                elif token == b"Tf" and len(operandos) >= 2 and isinstance(operandos[-2], str):
+                    nome_fonte = operandos[-2]
+                    if nome_fonte not in codecs:
+                        fonte = fontes.get(nome_fonte)
+                        if fonte is None:
+                            raise _FonteNaoSuportada(nome_fonte)
+                        codecs[nome_fonte] = _codec_fonte(fonte)
+                    codec = codecs[nome_fonte]
+                elif token == b"BT":
+                    y = y_linha = 0.0
+                elif token == b"Tm" and len(operandos) >= 6:
+                    y = y_linha = float(operandos[-1])
+                elif token in (b"Td", b"TD") and len(operandos) >= 2:
+                    y = y_linha = y_linha + float(operandos[-1])
+                elif token == b"T*":
+                    _quebra()
+                elif token == b"Tj" and operandos and isinstance(operandos[-1], bytes):
+                    _mostrar(operandos[-1])
+                elif token in (b"'", b'"') and operandos and isinstance(operandos[-1], bytes):
+                    _quebra()
+                    _mostrar(operandos[-1])
+                elif token == b"TJ" and operandos and isinstance(operandos[-1], list):
+                    partes = []
+                    for item in operandos[-1]:
+                        if isinstance(item, bytes):
+                            partes.append(item)
+                        elif isinstance(item, float) and item < -250:
+                            partes.append(b" ")
+                    _mostrar(b"".join(partes))
+                elif token == b"Do" and operandos and isinstance(operandos[-1], str):
+                    xobj = xobjects.get(operandos[-1])
+                    if xobj is not None and xobj.get_object().get("/Subtype") == "/Form":
+                        raise _FonteNaoSuportada(operandos[-1])
+                operandos.clear()
+        _quebra()
+        return "\n".join(linhas)
+
+
+BACKENDS: Dict[str, BackendTexto] = {
+    BackendPypdf.nome: BackendPypdf(),
+    BackendConteudo.nome: BackendConteudo(),
+}
+BACKEND_PADRAO = BackendPypdf.nome
+
+# backend="auto" so troca o padrao por um backend pelo menos 20% mais rapido.
+MARGEM_BACKEND = 0.8
+
+
+def _resolver_backend(backend: Union[str, BackendTexto, None]) -> BackendTexto:
+    if backend is None:
+        return BACKENDS[BACKEND_PADRAO]
+    if isinstance(backend, BackendTexto):
+        return backend
+    return BACKENDS[backend]
+
+
+def _versao_parser(backend: BackendTexto) -> str:
+    # O backend padrao mantem o carimbo antigo (cache existente continua valido).
+    if backend.nome == BACKEND_PADRAO:
+        return PARSER_VERSION
+    return f"{PARSER_VERSION}+{backend.nome}"
+
+
+def carregar_recibo_uber(
+    fonte: ReciboFonte,
+    cache: Optional[ReciboCache] = None,
+    max_pages: int = MAX_PAGINAS,
+    nome: Optional[str] = None,
+    backend: Union[str, BackendTexto, None] = None,
+    prefiltro: bool = False,
+    metricas: Optional[ResultadoArquivo] = None,
+) -> Recibo:
+    """Parse one receipt from a path, bytes, memoryview or binary file object.
+
+    Paths are memory-mapped and the same buffer feeds both the cache hash and
+    pypdf. Pages are read only until the required fields are found. `nome`
+    sets the "arquivo" field (default: file basename); `backend` picks the
+    text extractor (name in BACKENDS or an instance, default pypdf). With
+    `prefiltro` (always on in the folder loaders), files without a PDF
+    header or whose first page does not look like an Uber receipt raise
+    NaoEhReciboUber before any further extraction.
+    `metricas` is filled with size, page counts, durations and, with a
+    cache, the SHA-256.
+    """
+    if nome is None:
+        nome = _nome_fonte(fonte)
+    if metricas is None:
+        metricas = ResultadoArquivo(nome)
+    backend = _resolver_backend(backend)
+    recibo = _ler_recibo(fonte, cache, max_pages, nome, backend, prefiltro, metricas)
+    if cache is not None and metricas.status != "cache":
+        cache.put(metricas.sha256, _versao_parser(backend), recibo.to_dict())
+    return recibo
+
+
+def _ler_recibo(
+    fonte: ReciboFonte,
+    cache: Optional[ReciboCache],
+    max_pages: int,
+    nome: Optional[str],
+    backend: BackendTexto,
+    prefiltro: bool,
+    metricas: ResultadoArquivo,
+) -> Recibo:
+    """carregar_recibo_uber without the cache write (the digest goes to `metricas`)."""
+    with _abrir_buffer(fonte) as buffer:
+        metricas.bytes = len(buffer)
+        if prefiltro and not _tem_cabecalho_pdf(buffer):
+            raise NaoEhReciboUber(f"{nome}: sem cabecalho PDF")
+        if cache is not None:
+            metricas.sha256 = hashlib.sha256(buffer).hexdigest()
+            dados = cache.get(metricas.sha256, _versao_parser(backend))
+            if dados is not None:
+                recibo = Recibo.from_dict(dados)
+                recibo.arquivo = nome
+                metricas.status = "cache"
+                return recibo
+        return _parse_recibo_uber(_stream_buffer(buffer), nome, max_pages, backend, prefiltro, metricas)
+
+
+class _Campo(NamedTuple):
+    """Declarative field spec: anchor line, offsets to read and value extractor.
+
+    `modo` is "contem" (key in normalized line), "igual" (exact match),
+    "prefixo" (line starts with key) or "regex" (key matched at the start of
+    the normalized line). Offsets are
+    tried in order; with `primeira` the first anchor decides the field even
+    when no value is found there.
+    """
+
+    nome: str
+    chave: str
+    modo: str
+    offsets: Tuple[int, ...]
+    extrator: Callable[[str, str], Optional[object]]
+    primeira: bool = False
+
+
+_TIME_RE = re.compile(r"^\d{1,2}:\d{2}$")
+_DIST_DUR_RE = re.compile(r"([0-9.]+)\s*quilometros,\s*(\d+)\s*minutes")
+
+
+def _valor_moeda(line: str, norm: str) -> Optional[float]:
+    return _extract_currency_from_line(line)
+
+
+def _valor_texto(line: str, norm: str) -> Optional[str]:
+    return _clean_text(line)
+
+
+def _valor_hora(line: str, norm: str) -> Optional[str]:
+    return _clean_text(line) if _TIME_RE.match(line) else None
+
+
+def _valor_dist_dur(grupo: int, line: str, norm: str) -> Optional[str]:
+    m = _DIST_DUR_RE.search(norm)
+    return m.group(grupo) if m else None
+
+
+def _grupo_dist_dur(grupo: int) -> Callable[[str, str], Optional[str]]:
+    # partial (e nao closure): layouts precisam ser picklable para chegar aos workers.
+    return partial(_valor_dist_dur, grupo)
+
+
+CAMPOS_RECIBO: Tuple[_Campo, ...] = (
+    # Data e hora (topo)
+    _Campo("data_texto", r"\d{1,2} de ", "regex", (0,), _valor_texto, True),
+    _Campo("hora", r"\d{1,2} de ", "regex", (1,), _valor_hora, True),
+    # Totais e itens
+    _Campo("total", "total", "contem", (0, 1), _valor_moeda),
+    _Campo("preco_viagem", "preco da viagem", "contem", (0, 1), _valor_moeda),
+    _Campo("taxa_intermediacao", "taxa de intermediacao", "contem", (0, 1), _valor_moeda),
+    _Campo("custo_fixo", "custo fixo", "contem", (0, 1), _valor_moeda),
+    _Campo("promocao", "promocao", "contem", (0, 1), _valor_moeda),
+    # Pagamentos
+    _Campo("pagamento_linha", "pagamentos", "igual", (1,), _valor_texto, True),
     # Informacoes da viagem
-    categoria = None
-    distancia = None
-    duracao = None
-    for i, line in enumerate(lines):
-        if _norm_text(line) == "informacoes da viagem":
-            if i + 1 < len(lines):
-                categoria = _clean_text(lines[i + 1])
-            if i + 2 < len(lines):
-                info = lines[i + 2]
-                m = re.search(r"([0-9.]+)\s*quilometros,\s*(\d+)\s*minutes", _norm_text(info))
-                if m:
-                    distancia = m.group(1)
-                    duracao = m.group(2)
-            break
+    _Campo("categoria", "informacoes da viagem", "igual", (1,), _valor_texto, True),
+    _Campo("distancia_km", "informacoes da viagem", "igual", (2,), _grupo_dist_dur(1), True),
+    _Campo("duracao_min", "informacoes da viagem", "igual", (2,), _grupo_dist_dur(2), True),
+)
+
+
+class _ExtratorCampos:
+    """Fills every field of a spec in a single pass over the lines.
+
+    "igual" anchors are looked up in a dict keyed by the normalized line, so
+    layouts described with exact labels cost one lookup per line.
+    """
+
+    def __init__(self, campos: Tuple[_Campo, ...]):
+        self.campos = campos
+        self._regex = {c.chave: re.compile(c.chave) for c in campos if c.modo == "regex"}
+
+    def _ancora(self, campo: _Campo, norm: str) -> bool:
+        if campo.modo == "contem":
+            return campo.chave in norm
+        if campo.modo == "prefixo":
+            return norm.startswith(campo.chave)
+        return self._regex[campo.chave].match(norm) is not None
+
+    def varredura(self) -> "_Varredura":
+        return _Varredura(self)
+
+    def extrair(self, lines: List[str], norms: List[str]) -> Tuple[Dict, Dict[str, int]]:
+        """Return (values, anchor index per field found)."""
+        varredura = self.varredura()
+        varredura.avancar(lines, norms, final=True)
+        return varredura.valores, varredura.posicoes
+
+
+class _Varredura:
+    """Resumable scan of _ExtratorCampos: lines appended later are scanned once.
+
+    A field anchored near the end whose value line was not read yet stays
+    pending; scanning resumes at that line on the next call (or settles it
+    with what exists when `final`).
+    """
+
+    __slots__ = ("extrator", "valores", "posicoes", "iguais", "outros", "proxima")
+
+    def __init__(self, extrator: _ExtratorCampos):
+        self.extrator = extrator
+        self.valores: Dict[str, Optional[object]] = {c.nome: None for c in extrator.campos}
+        self.posicoes: Dict[str, int] = {}
+        self.iguais: Dict[str, List[_Campo]] = {}
+        self.outros: List[_Campo] = []
+        for campo in extrator.campos:
+            if campo.modo == "igual":
+                self.iguais.setdefault(campo.chave, []).append(campo)
+            else:
+                self.outros.append(campo)
+        self.proxima = 0
+
+    def _resolver(self, campo: _Campo, i: int, lines: List[str], norms: List[str], final: bool) -> Optional[bool]:
+        """True if settled, False if this anchor gave nothing, None if pending."""
+        n = len(lines)
+        valor = None
+        for off in campo.offsets:
+            if i + off >= n:
+                if not final:
+                    return None
+                break
+            valor = campo.extrator(lines[i + off], norms[i + off])
+            if valor is not None:
+                break
+        if valor is None and not campo.primeira:
+            return False
+        self.valores[campo.nome] = valor
+        self.posicoes[campo.nome] = i
+        return True
+
+    def avancar(self, lines: List[str], norms: List[str], final: bool = False) -> None:
+        """Scan the lines not seen yet; `final` means no more lines will come."""
+        iguais = self.iguais
+        i = self.proxima
+        while i < len(norms) and (iguais or self.outros):
+            norm = norms[i]
+            pendente = False
+            candidatos = iguais.get(norm)
+            if candidatos:
+                restantes = []
+                for campo in candidatos:
+                    r = self._resolver(campo, i, lines, norms, final)
+                    pendente = pendente or r is None
+                    if not r:
+                        restantes.append(campo)
+                if restantes:
+                    iguais[norm] = restantes
+                else:
+                    del iguais[norm]
+            if self.outros:
+                restantes = []
+                for campo in self.outros:
+                    r = self.extrator._ancora(campo, norm) and self._resolver(campo, i, lines, norms, final)
+                    pendente = pendente or r is None
+                    if not r:
+                        restantes.append(campo)
+                self.outros = restantes
+            if pendente:
+                break
+            i += 1
+        self.proxima = i
+
+
+_EXTRATOR_RECIBO = _ExtratorCampos(CAMPOS_RECIBO)
+
+# Campos que encerram a leitura de paginas. Os itens da tarifa (preco, taxa,
+# custo fixo, promocao) vem antes de "pagamentos" e podem nao existir.
+CAMPOS_OBRIGATORIOS = (
+    "data_texto",
+    "hora",
+    "total",
+    "pagamento_linha",
+    "categoria",
+    "distancia_km",
+    "duracao_min",
+)
 
+
+def _extrair_pontos(lines: List[str], norms: List[str], start_idx: int) -> Tuple[List[PontoViagem], bool]:
+    """Return (points, closed); closed means more lines cannot change the result."""
     # Origem e destino (pegando os dois primeiros horarios apos informacoes da viagem)
     pontos = []
-    time_re = re.compile(r"^\d{1,2}:\d{2}$")
-    start_idx = 0
-    for i, line in enumerate(lines):
-        if _norm_text(line) == "informacoes da viagem":
-            start_idx = i + 1
-            break
-
+    fechado = False
     i = start_idx
     while i < len(lines):
-        if time_re.match(lines[i]):
-            hora = _clean_text(lines[i])
+        if _TIME_RE.match(lines[i]):
+            hora = lines[i]
             addr_lines = []
             j = i + 1
-            while j < len(lines) and not time_re.match(lines[j]):
-                if _norm_text(lines[j]).startswith("voce viajou"):
+            while j < len(lines) and not _TIME_RE.match(lines[j]):
+                if norms[j].startswith("voce viajou"):
                     break
-                addr_lines.append(_clean_text(lines[j]))
+                addr_lines.append(lines[j])
                 j += 1
-            pontos.append({"hora": hora, "endereco": " ".join(addr_lines).strip()})
+            pontos.append(PontoViagem(hora, " ".join(addr_lines).strip()))
             i = j
             if len(pontos) >= 2:
+                fechado = j < len(lines)
                 break
         else:
             i += 1
+    return pontos, fechado
+
+
+# Linhas (normalizadas) que compoem a impressao digital do layout.
+MARCADORES_LAYOUT = (
+    "total",
+    "preco da viagem",
+    "taxa de intermediacao",
+    "custo fixo",
+    "promocao",
+    "pagamentos",
+    "informacoes da viagem",
+)
+_MARCADORES_LAYOUT = frozenset(MARCADORES_LAYOUT)
+
+
+class ImpressaoLayout(NamedTuple):
+    """Cheap structural fingerprint: producer, page count and first-page markers."""
+
+    produtor: str
+    paginas: int
+    marcadores: Tuple[str, ...]
 
+    @property
+    def id(self) -> str:
+        return hashlib.sha1(repr((self.produtor, self.marcadores)).encode("utf-8")).hexdigest()[:8]
+
+
+class Layout(NamedTuple):
+    """Known receipt layout: first-page markers (in order) and its compiled parser."""
+
+    nome: str
+    marcadores: Tuple[str, ...]
+    extrator: _ExtratorCampos
+    produtor: str = ""
+
+
+# Layout atual: rotulos da tarifa em linha propria, valor na linha seguinte.
+CAMPOS_UBER_2024: Tuple[_Campo, ...] = (
+    _Campo("data_texto", r"\d{1,2} de ", "regex", (0,), _valor_texto, True),
+    _Campo("hora", r"\d{1,2} de ", "regex", (1,), _valor_hora, True),
+    _Campo("total", "total", "igual", (1,), _valor_moeda),
+    _Campo("preco_viagem", "preco da viagem", "igual", (1,), _valor_moeda),
+    _Campo("taxa_intermediacao", "taxa de intermediacao", "igual", (1,), _valor_moeda),
+    _Campo("custo_fixo", "custo fixo", "prefixo", (0, 1), _valor_moeda),
+    _Campo("promocao", "promocao", "prefixo", (0, 1), _valor_moeda),
+    _Campo("pagamento_linha", "pagamentos", "igual", (1,), _valor_texto, True),
+    _Campo("categoria", "informacoes da viagem", "igual", (1,), _valor_texto, True),
+    _Campo("distancia_km", "informacoes da viagem", "igual", (2,), _grupo_dist_dur(1), True),
+    _Campo("duracao_min", "informacoes da viagem", "igual", (2,), _grupo_dist_dur(2), True),
+)
+
+LAYOUTS: List[Layout] = [
+    Layout(
+        "uber_2024",
+        ("total", "preco da viagem", "taxa de intermediacao", "pagamentos", "informacoes da viagem"),
+        _ExtratorCampos(CAMPOS_UBER_2024),
+    ),
+]
+
+
+def registrar_layout(nome: str, marcadores: Tuple[str, ...], campos: Tuple[_Campo, ...], produtor: str = "") -> None:
+    """Register a specialized parser for receipts with these first-page markers.
+
+    The folder loaders hand the registry to their worker processes when the
+    pool starts, so layouts registered before the call apply with any
+    `workers` and start method. Extractor callables in `campos` must then be
+    picklable (module-level functions or functools.partial, no lambdas).
+    """
+    LAYOUTS.append(Layout(nome, tuple(marcadores), _ExtratorCampos(campos), produtor))
+
+
+def _impressao_layout(reader: PdfReader, norms: List[str]) -> ImpressaoLayout:
+    try:
+        produtor = str((reader.metadata or {}).get("/Producer") or "")
+    except Exception:
+        produtor = ""
+    marcadores = tuple(dict.fromkeys(n for n in norms if n in _MARCADORES_LAYOUT))
+    return ImpressaoLayout(produtor, len(reader.pages), marcadores)
+
+
+def _identificar_layout(impressao: ImpressaoLayout) -> Optional[Layout]:
+    for layout in LAYOUTS:
+        if layout.marcadores == impressao.marcadores and impressao.produtor.startswith(layout.produtor):
+            return layout
+    return None
+
+
+def _tem_cabecalho_pdf(buffer: Union[bytes, bytearray, memoryview, mmap.mmap]) -> bool:
+    # A especificacao tolera lixo antes de "%PDF-" no primeiro KB.
+    return bytes(buffer[:1024]).find(b"%PDF-") >= 0
+
+
+def _parece_recibo(impressao: ImpressaoLayout, norms: List[str]) -> bool:
+    """First-page check: mentions Uber, or carries at least two receipt markers."""
+    if "uber" in impressao.produtor.lower() or len(impressao.marcadores) >= 2:
+        return True
+    return any("uber" in n for n in norms)
+
+
+def parece_recibo_uber(fonte: ReciboFonte, backend: Union[str, BackendTexto, None] = None) -> bool:
+    """Cheap pre-check: reads only the header, metadata and first page text."""
+    backend = _resolver_backend(backend)
+    with _abrir_buffer(fonte) as buffer:
+        if not _tem_cabecalho_pdf(buffer):
+            return False
+        try:
+            reader = PdfReader(_stream_buffer(buffer))
+            if not reader.pages:
+                return False
+            texto = backend.texto_pagina(reader.pages[0])
+        except Exception:
+            return False
+        norms = [_norm_text(c) for c in (_clean_text(line) for line in texto.splitlines()) if c]
+        # Ainda dentro do with: os metadados sao lidos do buffer (mmap) sob demanda.
+        return _parece_recibo(_impressao_layout(reader, norms), norms)
+
+
+def resumo_layouts(recibos: Iterable[Recibo]) -> Dict[Optional[str], int]:
+    """Receipt count per layout; unknown fingerprints show up as "desconhecido:<id>"."""
+    contagem: Dict[Optional[str], int] = {}
+    for recibo in recibos:
+        contagem[recibo.layout] = contagem.get(recibo.layout, 0) + 1
+    return contagem
+
+
+def _extrair_linhas(
+    lines: List[str], norms: List[str], extrator: _ExtratorCampos = _EXTRATOR_RECIBO
+) -> Tuple[Dict, List[PontoViagem], bool]:
+    """Return (field values, points, complete) for the lines read so far."""
+    valores, posicoes = extrator.extrair(lines, norms)
+    return _com_pontos(valores, posicoes, lines, norms)
+
+
+def _com_pontos(
+    valores: Dict, posicoes: Dict[str, int], lines: List[str], norms: List[str]
+) -> Tuple[Dict, List[PontoViagem], bool]:
+    start_idx = posicoes["categoria"] + 1 if "categoria" in posicoes else 0
+    pontos, fechado = _extrair_pontos(lines, norms, start_idx)
+    completo = fechado and all(valores[nome] is not None for nome in CAMPOS_OBRIGATORIOS)
+    return valores, pontos, completo
+
+
+def _completo(varredura: _Varredura, lines: List[str], norms: List[str]) -> bool:
+    # Pontos so sao procurados quando os campos ja fecharam (evita reler o documento a cada pagina).
+    if any(varredura.valores[nome] is None for nome in CAMPOS_OBRIGATORIOS):
+        return False
+    return _extrair_pontos(lines, norms, varredura.posicoes["categoria"] + 1)[1]
+
+
+def _parse_recibo_uber(
+    stream: BinaryIO,
+    nome: Optional[str],
+    max_pages: int = MAX_PAGINAS,
+    backend: Optional[BackendTexto] = None,
+    prefiltro: bool = False,
+    metricas: Optional[ResultadoArquivo] = None,
+) -> Recibo:
+    backend = _resolver_backend(backend)
+    if metricas is None:
+        metricas = ResultadoArquivo(nome)
+    inicio = time.perf_counter()
+    reader = PdfReader(stream)
+    metricas.paginas = len(reader.pages)
+    metricas.extracao_s += time.perf_counter() - inicio
+    lines: List[str] = []
+    norms: List[str] = []
+    varredura: Optional[_Varredura] = None
+    extrator = _EXTRATOR_RECIBO
+    layout_nome = None
+    for idx, page in enumerate(reader.pages):
+        if idx >= max_pages:
+            break
+        inicio = time.perf_counter()
+        texto = backend.texto_pagina(page)
+        metricas.paginas_lidas += 1
+        meio = time.perf_counter()
+        metricas.extracao_s += meio - inicio
+        novas = [c for c in (_clean_text(line) for line in texto.splitlines()) if c]
+        lines.extend(novas)
+        norms.extend(_norm_text(line) for line in novas)
+        if idx == 0:
+            impressao = _impressao_layout(reader, norms)
+            if prefiltro and not _parece_recibo(impressao, norms):
+                raise NaoEhReciboUber(f"{nome}: primeira pagina nao parece recibo Uber")
+            layout = _identificar_layout(impressao)
+            if layout is not None:
+                extrator = layout.extrator
+                layout_nome = layout.nome
+            else:
+                layout_nome = f"desconhecido:{impressao.id}"
+            varredura = extrator.varredura()
+        # Cada pagina so e varrida uma vez; as anteriores ja estao no estado da varredura.
+        varredura.avancar(lines, norms)
+        completo = _completo(varredura, lines, norms)
+        metricas.parse_s += time.perf_counter() - meio
+        # Paginas extras (termos, suporte, mapa) so sao lidas se faltar algo.
+        if completo:
+            break
+    if varredura is None:
+        resultado = _extrair_linhas(lines, norms)
+    else:
+        inicio = time.perf_counter()
+        varredura.avancar(lines, norms, final=True)
+        resultado = _com_pontos(varredura.valores, varredura.posicoes, lines, norms)
+        metricas.parse_s += time.perf_counter() - inicio
+    if extrator is not _EXTRATOR_RECIBO and any(resultado[0][n] is None for n in CAMPOS_OBRIGATORIOS):
+        # Layout conhecido que nao encaixou: volta para as heuristicas gerais.
+        resultado = _extrair_linhas(lines, norms)
+        layout_nome = f"desconhecido:{impressao.id}"
+    valores, pontos, _ = resultado
+    data_str = valores["data_texto"]
+
+    return Recibo(
+        arquivo=nome,
+        data_texto=data_str,
+        hora=valores["hora"],
+        data_yyyymmdd=_parse_date_pt(_norm_text(data_str or "")),
+        total=valores["total"],
+        preco_viagem=valores["preco_viagem"],
+        taxa_intermediacao=valores["taxa_intermediacao"],
+        custo_fixo=valores["custo_fixo"],
+        promocao=valores["promocao"],
+        pagamento_linha=valores["pagamento_linha"],
+        categoria=valores["categoria"],
+        distancia_km=valores["distancia_km"],
+        duracao_min=valores["duracao_min"],
+        origem=pontos[0] if len(pontos) > 0 else None,
+        destino=pontos[1] if len(pontos) > 1 else None,
+        layout=layout_nome,
+    )
+
+
+_Resultado = Tuple[ResultadoArquivo, Optional[Recibo]]
+
+
+# Margem do processo principal sobre o alarme do worker antes de matar o processo.
+FOLGA_TIMEOUT_S = 1.0
+
+# Intervalo entre consultas a `parar` enquanto iter_recibos_pasta espera um worker.
+INTERVALO_PARAR_S = 0.1
+
+
+class TempoEsgotado(BaseException):
+    """A file exceeded its time budget in an isolated worker.
+
+    BaseException so that broad `except Exception` blocks inside pypdf cannot
+    swallow the alarm.
+    """
+
+
+def _estourar_tempo(signum, frame) -> None:
+    raise TempoEsgotado("tempo limite por arquivo excedido")
+
+
+@contextmanager
+def _limite_tempo(timeout_s: Optional[float]) -> Iterator[None]:
+    # So em workers isolados: SIGALRM precisa da thread principal do processo.
+    if not timeout_s or not hasattr(signal, "setitimer"):
+        yield
+        return
+    anterior = signal.signal(signal.SIGALRM, _estourar_tempo)
+    signal.setitimer(signal.ITIMER_REAL, timeout_s)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+
+# Conexao do worker com o cache de conteudo (so leitura; quem grava e o processo principal).
+_CACHE_WORKER: Optional[ReciboCache] = None
+
+
+def _inicializar_worker(
+    limite_memoria_mb: Optional[int],
+    caminho_cache: Optional[str] = None,
+    layouts: Optional[Tuple[Layout, ...]] = None,
+) -> None:
+    global _CACHE_WORKER
+    if layouts is not None:
+        # Com spawn/forkserver o worker so conhece os layouts definidos no import.
+        LAYOUTS[:] = layouts
+    if caminho_cache is not None:
+        _CACHE_WORKER = ReciboCache(os.path.dirname(caminho_cache), os.path.basename(caminho_cache))
+    if limite_memoria_mb is None or resource is None:
+        return
+    _, maximo = resource.getrlimit(resource.RLIMIT_AS)
+    limite = limite_memoria_mb * 1024 * 1024
+    if maximo != resource.RLIM_INFINITY:
+        limite = min(limite, maximo)
+    resource.setrlimit(resource.RLIMIT_AS, (limite, maximo))
+
+
+def _carregar_recibo_seguro(
+    fonte: ReciboFonte,
+    nome: Optional[str] = None,
+    backend: Optional[BackendTexto] = None,
+    timeout_s: Optional[float] = None,
+    cache: Optional[ReciboCache] = None,
+) -> _Resultado:
+    """Parse one file and report its outcome instead of raising.
+
+    The content cache (`cache`, or the worker's own connection) is looked up
+    with the same buffer that is parsed; new receipts are left for the caller
+    to store, using `metricas.sha256`.
+    """
+    metricas = ResultadoArquivo(nome)
+    inicio = time.perf_counter()
+    recibo = None
+    if cache is None:
+        cache = _CACHE_WORKER
+    try:
+        with _limite_tempo(timeout_s):
+            recibo = _ler_recibo(fonte, cache, MAX_PAGINAS, nome, _resolver_backend(backend), True, metricas)
+    except (Exception, TempoEsgotado) as exc:
+        if isinstance(exc, NaoEhReciboUber):
+            metricas.status = "ignorado"
+        elif isinstance(exc, (TempoEsgotado, MemoryError)):
+            metricas.status = "abortado"
+        else:
+            metricas.status = "falha"
+        metricas.erro = type(exc).__name__
+        metricas.mensagem = str(exc)[:200]
+    metricas.total_s = time.perf_counter() - inicio
+    return metricas, recibo
+
+
+def _laco_worker(conexao, initializer: Callable, initargs: tuple) -> None:
+    initializer(*initargs)
+    while True:
+        try:
+            tarefa = conexao.recv()
+        except EOFError:
+            return
+        if tarefa is None:
+            return
+        fn, args, kwargs = tarefa
+        try:
+            conexao.send((True, fn(*args, **kwargs)))
+        except Exception as exc:
+            conexao.send((False, exc))
+
+
+class _ExecutorIsolado(Executor):
+    """Process executor that enforces a wall-clock deadline per task.
+
+    Each of the `workers` slots drives one worker process over a pipe. When
+    a task runs past `timeout_s` (or its process dies) the process is killed
+    and replaced and the task's future fails with TempoEsgotado (or
+    BrokenProcessPool); the other slots are not affected.
+    """
+
+    def __init__(self, workers: int, timeout_s: Optional[float], initializer: Callable, initargs: tuple):
+        self._timeout_s = timeout_s
+        self._initializer = initializer
+        self._initargs = initargs
+        self._contexto = multiprocessing.get_context()
+        self._tarefas: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._vagas = [threading.Thread(target=self._vaga, daemon=True) for _ in range(workers)]
+        for vaga in self._vagas:
+            vaga.start()
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        fut: Future = Future()
+        self._tarefas.put((fut, fn, args, kwargs))
+        return fut
+
+    def _novo_processo(self):
+        pai, filho = self._contexto.Pipe()
+        processo = self._contexto.Process(
+            target=_laco_worker, args=(filho, self._initializer, self._initargs), daemon=True
+        )
+        processo.start()
+        filho.close()
+        return processo, pai
+
+    def _esperar(self, processo, conexao) -> bool:
+        """True when the answer arrived, False on timeout; EOFError if the worker died."""
+        prazo = None if self._timeout_s is None else time.monotonic() + self._timeout_s
+        while True:
+            passo = 0.1 if prazo is None else min(0.1, prazo - time.monotonic())
+            if conexao.poll(max(passo, 0)):
+                return True
+            # Sem EOF garantido: outros workers herdam copias do pipe no fork.
+            if not processo.is_alive():
+                raise EOFError
+            if prazo is not None and time.monotonic() >= prazo:
+                return False
+
+    def _vaga(self) -> None:
+        processo = conexao = None
+        try:
+            while True:
+                tarefa = self._tarefas.get()
+                if tarefa is None:
+                    return
+                fut, fn, args, kwargs = tarefa
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                if processo is None:
+                    processo, conexao = self._novo_processo()
+                try:
+                    conexao.send((fn, args, kwargs))
+                    if self._esperar(processo, conexao):
+                        ok, valor = conexao.recv()
+                        if ok:
+                            fut.set_result(valor)
+                        else:
+                            fut.set_exception(valor)
+                        continue
+                    erro: BaseException = TempoEsgotado("tempo limite por arquivo excedido (worker encerrado)")
+                except (EOFError, OSError):
+                    erro = BrokenProcessPool("worker encerrado")
+                processo.kill()
+                processo.join()
+                conexao.close()
+                processo = conexao = None
+                fut.set_exception(erro)
+        finally:
+            if processo is not None:
+                try:
+                    conexao.send(None)
+                except OSError:
+                    pass
+                processo.join(1.0)
+                if processo.is_alive():
+                    processo.kill()
+                    processo.join()
+                conexao.close()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        if cancel_futures:
+            while True:
+                try:
+                    tarefa = self._tarefas.get_nowait()
+                except queue.Empty:
+                    break
+                if tarefa is not None:
+                    tarefa[0].cancel()
+        for _ in self._vagas:
+            self._tarefas.put(None)
+        if wait:
+            for vaga in self._vagas:
+                vaga.join()
+
+
+_EXT_COMPACTADOS = (".zip", ".tar", ".tar.gz", ".tgz")
+
+# Erros ao ler um membro: cifrado (RuntimeError), metodo desconhecido (NotImplementedError),
+# CRC/cabecalho invalido, deflate/gzip corrompido ou truncado.
+_ERROS_MEMBRO = (
+    zipfile.BadZipFile,
+    tarfile.TarError,
+    zlib.error,
+    RuntimeError,
+    NotImplementedError,
+    EOFError,
+    OSError,
+    ValueError,
+)
+
+
+# Erros do arquivo compactado em si: nao abre, indice corrompido ou fluxo truncado.
+_ERROS_COMPACTADO = (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError)
+
+
+def _membros_compactados(arquivo_path: str) -> Iterator[Tuple[str, Optional[bytes], Optional[Exception]]]:
+    """Yield (basename, bytes, None) for every PDF member, streamed from the archive.
+
+    A member that cannot be read is yielded as (basename, None, error); an
+    archive that cannot be opened or listed to the end raises one of
+    _ERROS_COMPACTADO.
+    """
+    if arquivo_path.lower().endswith(".zip"):
+        with zipfile.ZipFile(arquivo_path) as zf:
+            for info in zf.infolist():
+                if info.is_dir() or not info.filename.lower().endswith(".pdf"):
+                    continue
+                nome = posixpath.basename(info.filename)
+                try:
+                    dados = zf.read(info)
+                except _ERROS_MEMBRO as exc:
+                    yield nome, None, exc
+                    continue
+                yield nome, dados, None
+    else:
+        # Modo "r|*" le o tar sequencialmente, sem indexar o arquivo inteiro.
+        with tarfile.open(arquivo_path, "r|*") as tf:
+            for member in tf:
+                if not member.isfile() or not member.name.lower().endswith(".pdf"):
+                    continue
+                nome = posixpath.basename(member.name)
+                f = tf.extractfile(member)
+                if f is None:
+                    continue
+                try:
+                    dados = f.read()
+                except _ERROS_MEMBRO as exc:
+                    yield nome, None, exc
+                    continue
+                yield nome, dados, None
+
+
+def _listar_unidades(pasta_path: str, recursivo: bool, compactados: bool) -> Iterator[os.DirEntry]:
+    """Yield the files on disk to ingest: PDFs and, optionally, archives."""
+    with os.scandir(pasta_path) as it:
+        for entry in it:
+            nome = entry.name.lower()
+            if recursivo and entry.is_dir(follow_symlinks=False):
+                yield from _listar_unidades(entry.path, recursivo, compactados)
+            elif nome.endswith(".pdf"):
+                yield entry
+            elif compactados and nome.endswith(_EXT_COMPACTADOS) and entry.is_file():
+                yield entry
+
+
+def _expandir_unidade(entry: os.DirEntry) -> Iterator[Tuple[Optional[ReciboFonte], str, Optional[_Resultado]]]:
+    """Yield (source, name, outcome): the path itself for a PDF, member bytes for an archive.
+
+    Outcome is None, except for archive members that could not be read,
+    which come with a "falha" outcome and no source. An unreadable archive
+    raises one of _ERROS_COMPACTADO.
+    """
+    if entry.name.lower().endswith(".pdf"):
+        yield entry.path, entry.name, None
+        return
+    for membro, dados, erro in _membros_compactados(entry.path):
+        if erro is not None:
+            yield None, membro, (ResultadoArquivo(membro, "falha", type(erro).__name__, str(erro)[:200]), None)
+        else:
+            yield dados, membro, None
+
+
+class _Interrompido(Exception):
+    """`parar` fired inside iter_recibos_pasta."""
+
+
+class _Unidade:
+    """File on disk tracked by the manifest until all its PDFs have an outcome."""
+
+    __slots__ = ("caminho", "tamanho", "mtime_ns", "itens", "pendentes", "listada", "incompleta")
+
+    def __init__(self, caminho: str, tamanho: int, mtime_ns: int):
+        self.caminho = caminho
+        self.tamanho = tamanho
+        self.mtime_ns = mtime_ns
+        self.itens: List[Dict] = []
+        self.pendentes = 0
+        self.listada = False
+        self.incompleta = False
+
+
+_Item = Tuple[Optional[ReciboFonte], str, Optional[_Resultado], Optional[_Unidade]]
+
+
+def _item_manifesto(metricas: ResultadoArquivo, recibo: Optional[Recibo]) -> Dict:
     return {
-        "arquivo": os.path.basename(pdf_path),
-        "data_texto": data_str,
-        "hora": hora_str,
-        "data_yyyymmdd": _parse_date_pt(_norm_text(data_str or "")),
-        "total": total,
-        "preco_viagem": preco_viagem,
-        "taxa_intermediacao": taxa_inter,
-        "custo_fixo": custo_fixo,
-        "promocao": promocao,
-        "pagamento_linha": pagamento_linha,
-        "categoria": categoria,
-        "distancia_km": distancia,
-        "duracao_min": duracao,
-        "origem": pontos[0] if len(pontos) > 0 else None,
-        "destino": pontos[1] if len(pontos) > 1 else None,
+        "arquivo": metricas.arquivo,
+        "status": "ok" if recibo is not None else metricas.status,
+        "erro": metricas.erro,
+        "mensagem": metricas.mensagem,
+        "recibo": recibo.to_dict() if recibo is not None else None,
     }
 
 
-def carregar_recibos_pasta(pasta_path: str) -> List[Dict]:
-    recibos = []
+def _resultado_manifesto(item: Dict) -> _Resultado:
+    # Recibos voltam como "manifesto"; recusas e falhas repetem o registro original.
+    if item["recibo"] is not None:
+        recibo = Recibo.from_dict(item["recibo"])
+        return ResultadoArquivo(recibo.arquivo, "manifesto"), recibo
+    return ResultadoArquivo(item["arquivo"], item["status"], item["erro"], item["mensagem"]), None
+
+
+def _preparar_fontes(
+    pasta_path: str,
+    recursivo: bool,
+    compactados: bool,
+    cache: Optional[ReciboCache],
+    incremental: bool,
+    versao: str,
+    concluir_unidade: Callable[[_Unidade], None],
+) -> Iterator[_Item]:
+    """Yield (source, name, outcome, unit); outcome is None when it must be parsed.
+
+    Files whose (path, size, mtime_ns) match the manifest are answered with a
+    single stat call, replaying the recorded outcome (receipt, rejection or
+    failure); other files are opened only once, by the parser, which also
+    checks the content cache.
+    """
+    for entry in _listar_unidades(pasta_path, recursivo, compactados):
+        unidade = None
+        if cache is not None and incremental:
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            caminho = os.path.abspath(entry.path)
+            anteriores = cache.get_manifesto(caminho, st.st_size, st.st_mtime_ns, versao)
+            if anteriores is not None:
+                for anterior in anteriores:
+                    resultado = _resultado_manifesto(anterior)
+                    yield None, resultado[0].arquivo, resultado, None
+                continue
+            unidade = _Unidade(caminho, st.st_size, st.st_mtime_ns)
+
+        try:
+            for fonte, nome, resultado in _expandir_unidade(entry):
+                if unidade is not None:
+                    unidade.pendentes += 1
+                yield fonte, nome, resultado, unidade
+        except _ERROS_COMPACTADO as exc:
+            # Compactado ilegivel ou truncado: uma falha com o nome dele, e a unidade fica fora do manifesto.
+            falha = ResultadoArquivo(entry.name, "falha", type(exc).__name__, str(exc)[:200])
+            if unidade is not None:
+                unidade.incompleta = True
+                unidade.pendentes += 1
+            yield None, entry.name, (falha, None), unidade
+
+        if unidade is not None:
+            unidade.listada = True
+            if unidade.pendentes == 0:
+                concluir_unidade(unidade)
+
+
+def iter_recibos_pasta(
+    pasta_path: str,
+    workers: Optional[int] = None,
+    cache: Optional[ReciboCache] = None,
+    ordenado: bool = True,
+    recursivo: bool = False,
+    compactados: bool = False,
+    incremental: bool = True,
+    textos: Optional[DicionarioTextos] = None,
+    backend: Union[str, BackendTexto, None] = None,
+    ignorados: Optional[List[str]] = None,
+    falhas: Optional[List[str]] = None,
+    resultados: Optional[List[ResultadoArquivo]] = None,
+    log_jsonl: Optional[str] = None,
+    timeout_s: Optional[float] = None,
+    limite_memoria_mb: Optional[int] = None,
+    parar: Optional[Callable[[], bool]] = None,
+) -> Iterator[Recibo]:
+    """Yield each receipt of the folder as soon as it is parsed.
+
+    Only about 2 x `workers` files are in flight at a time (and at most
+    8 x `workers` results wait behind them), so memory does not grow with
+    the folder. With `ordenado=False` and `workers` > 1, receipts
+    come out in completion order instead of directory order. `recursivo`
+    walks subfolders; `compactados` reads PDFs inside .zip/.tar(.gz) files
+    straight from the archive, without extracting to disk. With `cache` and
+    `incremental`, files unchanged since the last run (same path, size and
+    mtime) are not even opened. Repeating text fields are interned in
+    `textos` (a new dictionary per call by default). `backend="auto"` picks
+    the text extractor with escolher_backend on a sample of the folder; with
+    `cache` the choice is stored and reused by later runs on the same folder.
+    Names of files rejected by the pre-filter (not Uber receipts) are
+    appended to `ignorados`; files that raised while parsing go to `falhas`.
+    One ResultadoArquivo per file (status, error, pages, bytes, durations)
+    is appended to `resultados` and, with `log_jsonl`, to that JSONL file.
+
+    `timeout_s` / `limite_memoria_mb` turn on isolation: every file is parsed
+    in a worker process under a wall-clock timer and an address-space limit
+    (POSIX only). The parent kills and replaces a worker whose file is still
+    running FOLGA_TIMEOUT_S after the deadline, or that dies. Such files are
+    recorded with status "abortado" (and in `falhas`) and skipped; they stay
+    out of the manifest, so the next run tries them again. The same goes for
+    an archive that cannot be opened or read to the end: it is reported as a
+    "falha" under the archive's own name.
+
+    `parar` is called between files (and every INTERVALO_PARAR_S while
+    waiting for a worker); once it returns True the walk stops, pending
+    files are cancelled without waiting for the ones still running, and
+    what was already parsed is flushed to the cache and log.
+    """
     if not os.path.isdir(pasta_path):
-        return recibos
-    for nome in os.listdir(pasta_path):
-        if not nome.lower().endswith(".pdf"):
-            continue
-        caminho = os.path.join(pasta_path, nome)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if textos is None:
+        textos = DicionarioTextos()
+    if backend == "auto":
+        backend = _backend_auto(pasta_path, recursivo, cache)
+    backend = _resolver_backend(backend)
+    versao = _versao_parser(backend)
+
+    novos: List[Tuple[str, str, Dict]] = []
+    manifesto: List[Tuple[str, int, int, str, List[Dict]]] = []
+    log = open(log_jsonl, "a", encoding="utf-8") if log_jsonl else None
+
+    def _gravar() -> None:
+        cache.put_many(novos)
+        cache.put_manifesto_many(manifesto)
+        novos.clear()
+        manifesto.clear()
+
+    def _concluir_unidade(unidade: _Unidade) -> None:
+        # Estouro de tempo/memoria pode ser carga da maquina, e um compactado ilegivel pode
+        # estar sendo copiado: nao grava, tenta de novo na proxima.
+        if unidade.incompleta or any(item["status"] == "abortado" for item in unidade.itens):
+            return
+        manifesto.append((unidade.caminho, unidade.tamanho, unidade.mtime_ns, versao, unidade.itens))
+        if len(manifesto) >= 256:
+            _gravar()
+
+    def _registrar(item: _Item, resultado: _Resultado) -> Optional[Recibo]:
+        if _parado():
+            raise _Interrompido
+        _, nome, _, unidade = item
+        metricas, recibo = resultado
+        if metricas.status == "ignorado" and ignorados is not None:
+            ignorados.append(nome)
+        elif metricas.status in ("falha", "abortado") and falhas is not None:
+            falhas.append(nome)
+        if resultados is not None:
+            resultados.append(metricas)
+        if log is not None:
+            log.write(json.dumps(metricas.to_dict(), ensure_ascii=False) + "\n")
+        if recibo is not None:
+            textos.internar_recibo(recibo)
+        if cache is None:
+            return recibo
+        if pool is not None and metricas.sha256 is not None:
+            # Os workers consultam o cache pela propria conexao; os contadores ficam aqui.
+            if metricas.status == "cache":
+                cache.hits += 1
+            else:
+                cache.misses += 1
+        if metricas.status == "ok" and metricas.sha256 is not None and recibo is not None:
+            novos.append((metricas.sha256, versao, recibo.to_dict()))
+            if len(novos) >= 256:
+                _gravar()
+        if unidade is not None:
+            unidade.itens.append(_item_manifesto(metricas, recibo))
+            unidade.pendentes -= 1
+            if unidade.listada and unidade.pendentes == 0:
+                _concluir_unidade(unidade)
+        return recibo
+
+    isolado = timeout_s is not None or limite_memoria_mb is not None
+    pool: Optional[Executor] = None
+    reserva: Optional[ProcessPoolExecutor] = None
+
+    def _novo_pool(n: int = workers) -> Executor:
+        initargs = (limite_memoria_mb, cache.caminho if cache is not None else None, tuple(LAYOUTS))
+        if isolado:
+            prazo = timeout_s + FOLGA_TIMEOUT_S if timeout_s is not None else None
+            return _ExecutorIsolado(n, prazo, _inicializar_worker, initargs)
+        return ProcessPoolExecutor(max_workers=n, initializer=_inicializar_worker, initargs=initargs)
+
+    def _parse(item: _Item) -> Union[_Resultado, Future]:
+        nonlocal pool
+        fonte, nome, anterior, _ = item
+        if anterior is not None:
+            return anterior
+        if pool is None:
+            return _carregar_recibo_seguro(fonte, nome, backend, cache=cache)
         try:
-            recibos.append(carregar_recibo_uber(caminho))
-        except Exception:
-            continue
-    return recibos
+            return pool.submit(_carregar_recibo_seguro, fonte, nome, backend, timeout_s)
+        except BrokenProcessPool:
+            # Um worker morreu (ex.: morto pelo sistema por memoria): recria o pool.
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = _novo_pool()
+            return pool.submit(_carregar_recibo_seguro, fonte, nome, backend, timeout_s)
+
+    def _parado() -> bool:
+        return parar is not None and parar()
+
+    def _aguardar(futuros: Iterable[Future]) -> set:
+        # Sem `parar`, espera bloqueando; com ele, acorda de tempos em tempos para consultar.
+        intervalo = None if parar is None else INTERVALO_PARAR_S
+        while True:
+            prontos, _ = wait(futuros, timeout=intervalo, return_when=FIRST_COMPLETED)
+            if prontos:
+                return prontos
+            if _parado():
+                raise _Interrompido
+
+    def _proximas() -> Iterator[_Item]:
+        for item in fontes:
+            if _parado():
+                raise _Interrompido
+            yield item
+
+    def _colher(item: _Item, fut: Future) -> _Resultado:
+        nonlocal reserva
+        fonte, nome = item[0], item[1]
+        _aguardar((fut,))
+        try:
+            return fut.result()
+        except TempoEsgotado as exc:
+            return ResultadoArquivo(nome, "abortado", type(exc).__name__, str(exc)), None
+        except BrokenProcessPool as exc:
+            if isolado:
+                # Cada worker isolado roda um arquivo por vez: o culpado e este.
+                return ResultadoArquivo(nome, "abortado", type(exc).__name__, "worker encerrado"), None
+            # O pool caiu e levou junto todos os arquivos em voo: refaz cada um
+            # sozinho num worker exclusivo, assim so o culpado e descartado.
+            if reserva is None:
+                reserva = _novo_pool(1)
+            try:
+                return reserva.submit(_carregar_recibo_seguro, fonte, nome, backend, timeout_s).result()
+            except BrokenProcessPool as exc:
+                reserva.shutdown(wait=False)
+                reserva = None
+                return ResultadoArquivo(nome, "abortado", type(exc).__name__, "worker encerrado"), None
+        except Exception as exc:
+            return ResultadoArquivo(nome, "falha", type(exc).__name__, str(exc)[:200]), None
+
+    fontes = _preparar_fontes(pasta_path, recursivo, compactados, cache, incremental, versao, _concluir_unidade)
+    try:
+        if workers <= 1 and not isolado:
+            try:
+                for item in _proximas():
+                    recibo = _registrar(item, _parse(item))
+                    if recibo is not None:
+                        yield recibo
+            except _Interrompido:
+                pass
+            return
+
+        limite = workers * 2
+        pool = _novo_pool()
+        try:
+            if ordenado:
+                fila: Deque[Tuple[_Item, Union[_Resultado, Future]]] = deque()
+                # Acertos de cache nao ocupam worker, mas esperam na fila atras de
+                # um parse lento: a fila tambem tem tamanho maximo.
+                limite_fila = limite * 4
+                em_voo = 0
+                for item in _proximas():
+                    resultado = _parse(item)
+                    if isinstance(resultado, Future):
+                        em_voo += 1
+                    fila.append((item, resultado))
+                    while fila and (
+                        em_voo >= limite or len(fila) >= limite_fila or not isinstance(fila[0][1], Future)
+                    ):
+                        item, resultado = fila.popleft()
+                        if isinstance(resultado, Future):
+                            em_voo -= 1
+                            resultado = _colher(item, resultado)
+                        recibo = _registrar(item, resultado)
+                        if recibo is not None:
+                            yield recibo
+                while fila:
+                    item, resultado = fila.popleft()
+                    if isinstance(resultado, Future):
+                        resultado = _colher(item, resultado)
+                    recibo = _registrar(item, resultado)
+                    if recibo is not None:
+                        yield recibo
+            else:
+                pendentes: Dict[Future, _Item] = {}
+                for item in _proximas():
+                    resultado = _parse(item)
+                    if not isinstance(resultado, Future):
+                        recibo = _registrar(item, resultado)
+                        if recibo is not None:
+                            yield recibo
+                        continue
+                    pendentes[resultado] = item
+                    if len(pendentes) >= limite:
+                        for fut in _aguardar(pendentes):
+                            item = pendentes.pop(fut)
+                            recibo = _registrar(item, _colher(item, fut))
+                            if recibo is not None:
+                                yield recibo
+                while pendentes:
+                    for fut in _aguardar(pendentes):
+                        item = pendentes.pop(fut)
+                        recibo = _registrar(item, _colher(item, fut))
+                        if recibo is not None:
+                            yield recibo
+        except _Interrompido:
+            pass
+        finally:
+            # Interrompido: cancela o que nao comecou e nao espera os arquivos em andamento.
+            esperar = not _parado()
+            pool.shutdown(wait=esperar, cancel_futures=True)
+            if reserva is not None:
+                reserva.shutdown(wait=esperar)
+    finally:
+        fontes.close()
+        if cache is not None:
+            _gravar()
+        if log is not None:
+            log.close()
+
+
+def carregar_recibos_pasta(
+    pasta_path: str,
+    workers: Optional[int] = None,
+    cache: Optional[ReciboCache] = None,
+    recursivo: bool = False,
+    compactados: bool = False,
+    incremental: bool = True,
+    textos: Optional[DicionarioTextos] = None,
+    backend: Union[str, BackendTexto, None] = None,
+    ignorados: Optional[List[str]] = None,
+    falhas: Optional[List[str]] = None,
+    resultados: Optional[List[ResultadoArquivo]] = None,
+    log_jsonl: Optional[str] = None,
+    timeout_s: Optional[float] = None,
+    limite_memoria_mb: Optional[int] = None,
+) -> List[Recibo]:
+    """Load every PDF in the folder; `workers` > 1 parses in a process pool.
+
+    `workers` defaults to the CPU count. Results keep the directory listing
+    order, so the output is identical to the serial run. With `cache`, files
+    already seen (same SHA-256) are not parsed again. See iter_recibos_pasta
+    for the other options.
+    """
+    return list(
+        iter_recibos_pasta(
+            pasta_path,
+            workers=workers,
+            cache=cache,
+            recursivo=recursivo,
+            compactados=compactados,
+            incremental=incremental,
+            textos=textos,
+            backend=backend,
+            ignorados=ignorados,
+            falhas=falhas,
+            resultados=resultados,
+            log_jsonl=log_jsonl,
+            timeout_s=timeout_s,
+            limite_memoria_mb=limite_memoria_mb,
+        )
+    )
+
+
+def amostra_pasta(pasta_path: str, n: int = 10, recursivo: bool = False) -> List[str]:
+    """First `n` PDF paths of the folder, used to compare backends."""
+    if not os.path.isdir(pasta_path):
+        return []
+    entries = (e for e in _listar_unidades(pasta_path, recursivo, False) if e.name.lower().endswith(".pdf"))
+    return [e.path for e in itertools.islice(entries, n)]
+
+
+def comparar_backends(
+    amostra: Iterable[ReciboFonte],
+    backends: Iterable[str] = tuple(BACKENDS),
+    referencia: str = BACKEND_PADRAO,
+) -> Dict[str, Dict]:
+    """Parse the sample with each backend; report time and divergences.
+
+    Returns {backend: {"segundos", "arquivos", "comparados", "divergencias"}},
+    where "comparados" counts the files parsed by both this backend and
+    `referencia`, and divergences lists the files whose Recibo differs from
+    `referencia` (including files only one of them could parse).
+    """
+    buffers = []
+    for fonte in amostra:
+        with _abrir_buffer(fonte) as buffer:
+            buffers.append((_nome_fonte(fonte), bytes(buffer)))
+    nomes = list(dict.fromkeys([referencia, *backends]))
+    resultados: Dict[str, List[Optional[Dict]]] = {}
+    relatorio: Dict[str, Dict] = {}
+    for nome_backend in nomes:
+        backend = _resolver_backend(nome_backend)
+        recibos: List[Optional[Dict]] = []
+        inicio = time.perf_counter()
+        for nome, dados in buffers:
+            try:
+                recibos.append(_parse_recibo_uber(io.BytesIO(dados), nome, MAX_PAGINAS, backend).to_dict())
+            except Exception:
+                recibos.append(None)
+        resultados[nome_backend] = recibos
+        relatorio[nome_backend] = {"segundos": time.perf_counter() - inicio, "arquivos": len(buffers)}
+    for nome_backend in nomes:
+        relatorio[nome_backend]["comparados"] = sum(
+            a is not None and b is not None for a, b in zip(resultados[referencia], resultados[nome_backend])
+        )
+        relatorio[nome_backend]["divergencias"] = [
+            nome
+            for (nome, _), a, b in zip(buffers, resultados[referencia], resultados[nome_backend])
+            if a != b
+        ]
+    return relatorio
+
+
+def escolher_backend(amostra: Iterable[ReciboFonte], referencia: str = BACKEND_PADRAO) -> str:
+    """Fastest backend whose output matches `referencia` on the whole sample.
+
+    Only backends that parsed at least one sample file exactly like
+    `referencia` qualify, and they must beat it by MARGEM_BACKEND: on a tie
+    the answer stays `referencia`, so it does not flip between runs. With
+    an empty or unreadable sample the answer is `referencia` itself
+    (BACKEND_PADRAO by default).
+    """
+    relatorio = comparar_backends(amostra, referencia=referencia)
+    limite = relatorio[referencia]["segundos"] * MARGEM_BACKEND
+    corretos = [
+        nome
+        for nome, r in relatorio.items()
+        if nome != referencia and r["comparados"] and not r["divergencias"] and r["segundos"] < limite
+    ]
+    if not corretos:
+        return referencia
+    return min(corretos, key=lambda nome: relatorio[nome]["segundos"])
+
+
+def _backend_auto(pasta_path: str, recursivo: bool, cache: Optional[ReciboCache]) -> str:
+    """escolher_backend on a sample of the folder, remembered in `cache`.
+
+    The version stamp of the cache entries depends on the backend, so a
+    stored choice keeps later runs hitting the same entries (and skips
+    parsing the sample again).
+    """
+    chave = f"backend:{PARSER_VERSION}:{os.path.abspath(pasta_path)}"
+    if cache is not None:
+        nome = cache.get_escolha(chave)
+        if nome in BACKENDS:
+            return nome
+    nome = escolher_backend(amostra_pasta(pasta_path, recursivo=recursivo))
+    if cache is not None:
+        cache.put_escolha(chave, nome)
+    return nome
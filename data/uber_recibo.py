@@ -0,0 +1,153 @@
+"""
+Slotted records for parsed Uber receipts.
+Both classes also behave as mappings (reads and item assignment of
+existing fields), so code written for the old dict records
+(recibo["total"], recibo.get("origem")) keeps working.
+DicionarioTextos interns the text fields that repeat across a batch;
+ResultadoArquivo records the per-file outcome of an ingestion run.
+"""
+
+from __future__ import annotations
+from collections.abc import Mapping
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class _MappingShim(Mapping):
+    """dict-style access over the dataclass fields (backward compatibility)."""
+
+    __slots__ = ()
+    _nomes: tuple = ()
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._nomes:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._nomes:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._nomes)
+
+    def __len__(self) -> int:
+        return len(self._nomes)
+
+
+@dataclass(slots=True, eq=False)
+class PontoViagem(_MappingShim):
+    hora: str
+    endereco: str
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"hora": self.hora, "endereco": self.endereco}
+
+
+@dataclass(slots=True, eq=False)
+class Recibo(_MappingShim):
+    arquivo: Optional[str]
+    data_texto: Optional[str]
+    hora: Optional[str]
+    data_yyyymmdd: Optional[str]
+    total: Optional[float]
+    preco_viagem: Optional[float]
+    taxa_intermediacao: Optional[float]
+    custo_fixo: Optional[float]
+    promocao: Optional[float]
+    pagamento_linha: Optional[str]
+    categoria: Optional[str]
+    distancia_km: Optional[str]
+    duracao_min: Optional[str]
+    origem: Optional[PontoViagem]
+    destino: Optional[PontoViagem]
+    layout: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        dados = {nome: getattr(self, nome) for nome in self._nomes}
+        for nome in ("origem", "destino"):
+            if dados[nome] is not None:
+                dados[nome] = dados[nome].to_dict()
+        return dados
+
+    @classmethod
+    def from_dict(cls, dados: Mapping) -> "Recibo":
+        valores = {nome: dados.get(nome) for nome in cls._nomes}
+        for nome in ("origem", "destino"):
+            ponto = valores[nome]
+            if ponto is not None and not isinstance(ponto, PontoViagem):
+                valores[nome] = PontoViagem(ponto.get("hora"), ponto.get("endereco"))
+        return cls(**valores)
+
+
+PontoViagem._nomes = tuple(f.name for f in fields(PontoViagem))
+Recibo._nomes = tuple(f.name for f in fields(Recibo))
+
+
+class DicionarioTextos:
+    """Batch-wide string dictionary: one shared object and one int code per text.
+
+    Receipts repeat the same category, card and addresses; interning them
+    here keeps a single copy per batch and gives stable codes for columnar
+    encoding (see ReciboTable).
+    """
+
+    __slots__ = ("valores", "_indice")
+
+    def __init__(self):
+        self.valores: List[str] = []
+        self._indice: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.valores)
+
+    def codigo(self, valor: str) -> int:
+        cod = self._indice.get(valor)
+        if cod is None:
+            cod = self._indice[valor] = len(self.valores)
+            self.valores.append(valor)
+        return cod
+
+    def internar(self, valor: Optional[str]) -> Optional[str]:
+        if valor is None:
+            return None
+        return self.valores[self.codigo(valor)]
+
+    def internar_recibo(self, recibo: Recibo) -> Recibo:
+        """Replace the repeating text fields of `recibo` by the shared copies."""
+        recibo.categoria = self.internar(recibo.categoria)
+        recibo.pagamento_linha = self.internar(recibo.pagamento_linha)
+        for ponto in (recibo.origem, recibo.destino):
+            if ponto is not None:
+                ponto.hora = self.internar(ponto.hora)
+                ponto.endereco = self.internar(ponto.endereco)
+        return recibo
+
+
+@dataclass(slots=True)
+class ResultadoArquivo:
+    """Outcome of ingesting one file: status, error and cost figures.
+
+    `status` is "ok", "cache" (content cache hit), "manifesto" (unchanged
+    file, not opened), "ignorado" (rejected by the pre-filter), "abortado"
+    (time or memory limit hit in an isolated worker) or "falha".
+    `sha256` is set when the content cache was checked. Durations are in
+    seconds; `extracao_s` covers opening the PDF and page text extraction,
+    `parse_s` the line normalization and field matching.
+    """
+
+    arquivo: Optional[str]
+    status: str = "ok"
+    erro: Optional[str] = None
+    mensagem: Optional[str] = None
+    paginas: Optional[int] = None
+    paginas_lidas: int = 0
+    bytes: Optional[int] = None
+    sha256: Optional[str] = None
+    extracao_s: float = 0.0
+    parse_s: float = 0.0
+    total_s: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
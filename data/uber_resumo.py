@@ -0,0 +1,101 @@
+"""
+Single-pass summary of a ReciboTable.
+Period keys are plain ints derived from YYYYMMDD arithmetic, so sorting
+them gives chronological order and no datetime objects are created.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Optional, Tuple
+from data.uber_recibo import DicionarioTextos
+from data.uber_table import ReciboTable
+
+
+class ResumoRecibos:
+    """Report figures computed in one pass over a ReciboTable.
+
+    `por_mes` is keyed by YYYYMM and `por_semana` by YYYYMM * 10 + week,
+    both ints, so sorted() is chronological across years. `por_categoria`
+    is keyed by the table's category code (-1 for no category) and holds
+    [trips, total]. Missing values count as zero in every total; receipts
+    without a valid date count in `quantidade`, `total` and their category
+    but in no period.
+    """
+
+    __slots__ = (
+        "quantidade",
+        "total",
+        "primeira_data",
+        "ultima_data",
+        "por_mes",
+        "por_semana",
+        "por_categoria",
+        "textos",
+    )
+
+    def __init__(self):
+        self.quantidade = 0
+        self.total = 0.0
+        self.primeira_data = 0
+        self.ultima_data = 0
+        self.por_mes: Dict[int, float] = {}
+        self.por_semana: Dict[int, float] = {}
+        self.por_categoria: Dict[int, List] = {}
+        self.textos: Optional[DicionarioTextos] = None
+
+    @classmethod
+    def from_table(cls, tabela: ReciboTable, coluna: str = "total") -> "ResumoRecibos":
+        resumo = cls()
+        total = 0.0
+        primeira = ultima = 0
+        por_mes = resumo.por_mes
+        por_semana = resumo.por_semana
+        por_categoria = resumo.por_categoria
+        for d, v, cat in zip(tabela.datas, tabela.valores[coluna], tabela.cod_categoria):
+            if v != v:
+                v = 0.0
+            total += v
+            acumulado = por_categoria.get(cat)
+            if acumulado is None:
+                por_categoria[cat] = [1, v]
+            else:
+                acumulado[0] += 1
+                acumulado[1] += v
+            if not d:
+                continue
+            if not primeira or d < primeira:
+                primeira = d
+            if d > ultima:
+                ultima = d
+            mes = d // 100
+            # Semana do mes 1..5 (dias 1-7 sao a semana 1).
+            semana = mes * 10 + (d % 100 - 1) // 7 + 1
+            por_mes[mes] = por_mes.get(mes, 0.0) + v
+            por_semana[semana] = por_semana.get(semana, 0.0) + v
+        resumo.quantidade = len(tabela)
+        resumo.total = total
+        resumo.primeira_data = primeira
+        resumo.ultima_data = ultima
+        resumo.textos = tabela.textos
+        return resumo
+
+    def periodo(self) -> Optional[Tuple[int, int]]:
+        """(first, last) YYYYMMDD, or None when no receipt has a valid date."""
+        if not self.primeira_data:
+            return None
+        return self.primeira_data, self.ultima_data
+
+    def meses(self) -> List[Tuple[int, float]]:
+        """[(YYYYMM, total)] in chronological order."""
+        return sorted(self.por_mes.items())
+
+    def categorias(self) -> List[Tuple[Optional[str], int, float]]:
+        """[(category, trips, total)], highest total first; None for receipts without one."""
+        itens = [
+            (None if cod < 0 else self.textos.valores[cod], viagens, total)
+            for cod, (viagens, total) in self.por_categoria.items()
+        ]
+        return sorted(itens, key=lambda item: (-item[2], item[0] or ""))
+
+    def semanas(self) -> List[Tuple[int, int, float]]:
+        """[(YYYYMM, week, total)] in chronological order."""
+        return [(chave // 10, chave % 10, v) for chave, v in sorted(self.por_semana.items())]
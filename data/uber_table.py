@@ -0,0 +1,77 @@
+"""
+Columnar container for parsed Uber receipts.
+Built once from the loader output; aggregations (data.uber_resumo) run
+over compact arrays instead of walking the receipt records again.
+"""
+
+from __future__ import annotations
+import calendar
+import math
+from array import array
+from functools import lru_cache
+from operator import attrgetter
+from typing import Dict, Iterable, Mapping, Optional, Union
+from data.uber_recibo import DicionarioTextos, Recibo
+
+COLUNAS_VALOR = ("total", "preco_viagem", "taxa_intermediacao", "custo_fixo", "promocao")
+
+# Campos lidos por append: os valores e depois data e categoria.
+_CAMPOS = (*COLUNAS_VALOR, "data_yyyymmdd", "categoria")
+_LER_RECIBO = attrgetter(*_CAMPOS)
+
+
+# Um lote tem poucas datas distintas: a validacao (monthrange) roda uma vez por data.
+@lru_cache(maxsize=4096)
+def _data_int(value: Optional[str]) -> int:
+    """Return YYYYMMDD as int, or 0 when missing or not a valid date."""
+    if not value or len(value) != 8 or not value.isdigit():
+        return 0
+    ano, mes, dia = int(value[:4]), int(value[4:6]), int(value[6:])
+    if ano < 1 or not 1 <= mes <= 12 or not 1 <= dia <= calendar.monthrange(ano, mes)[1]:
+        return 0
+    return int(value)
+
+
+class ReciboTable:
+    """Receipt batch stored column by column.
+
+    Money columns are array("d") with NaN for missing values, `datas` holds
+    int32 YYYYMMDD (0 when missing) and `cod_categoria` is dictionary-encoded:
+    codes index into `textos`, -1 is None. Pass the loader's DicionarioTextos
+    to share one encoding for the whole batch.
+    """
+
+    __slots__ = ("valores", "datas", "cod_categoria", "textos", "_colunas")
+
+    def __init__(self, textos: Optional[DicionarioTextos] = None):
+        self.valores: Dict[str, array] = {nome: array("d") for nome in COLUNAS_VALOR}
+        # Na ordem de _CAMPOS; zip para na ultima coluna de valor.
+        self._colunas = tuple(self.valores.values())
+        self.datas = array("i")
+        self.cod_categoria = array("i")
+        self.textos = textos if textos is not None else DicionarioTextos()
+
+    @classmethod
+    def from_recibos(cls, recibos: Iterable[Union[Recibo, Mapping]], textos: Optional[DicionarioTextos] = None) -> "ReciboTable":
+        tabela = cls(textos)
+        for recibo in recibos:
+            tabela.append(recibo)
+        return tabela
+
+    def __len__(self) -> int:
+        return len(self.datas)
+
+    def _codificar(self, valor: Optional[str]) -> int:
+        return -1 if valor is None else self.textos.codigo(valor)
+
+    def append(self, recibo: Union[Recibo, Mapping]) -> None:
+        if isinstance(recibo, Recibo):
+            # Direto dos slots: o shim de Mapping (recibo.get) custa varias vezes mais por campo.
+            campos = _LER_RECIBO(recibo)
+        else:
+            get = recibo.get
+            campos = [get(nome) for nome in _CAMPOS]
+        for coluna, valor in zip(self._colunas, campos):
+            coluna.append(math.nan if valor is None else float(valor))
+        self.datas.append(_data_int(campos[-2]))
+        self.cod_categoria.append(self._codificar(campos[-1]))
@@ -3,10 +3,16 @@ Entry point for Uber receipt report generation.
 """
 
 from datetime import datetime
-from data.uber_loader import carregar_recibos_pasta
+from data.uber_cache import ReciboCache
+from data.uber_loader import carregar_recibos_pasta, resumo_layouts
+from data.uber_recibo import DicionarioTextos
 from pdf.uber_builder import criar_relatorio_uber
 
 PASTA_RECIBOS = "uber"
+PASTA_CACHE = ".cache"
+ARQUIVO_LOG = ".cache/ingestao.jsonl"
+TIMEOUT_ARQUIVO_S = 60
+LIMITE_MEMORIA_MB = 1024
 
 
 def main():
@@ -14,15 +20,40 @@ def main():
     print("Relatorio UBER - Banco Vittoria")
     print("=" * 50)
 
-    recibos = carregar_recibos_pasta(PASTA_RECIBOS)
+    ignorados = []
+    falhas = []
+    # Um dicionario so para o lote: o relatorio reaproveita os codigos do loader.
+    textos = DicionarioTextos()
+    with ReciboCache(PASTA_CACHE) as cache:
+        recibos = carregar_recibos_pasta(
+            PASTA_RECIBOS,
+            cache=cache,
+            recursivo=True,
+            compactados=True,
+            textos=textos,
+            ignorados=ignorados,
+            falhas=falhas,
+            log_jsonl=ARQUIVO_LOG,
+            timeout_s=TIMEOUT_ARQUIVO_S,
+            limite_memoria_mb=LIMITE_MEMORIA_MB,
+        )
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    if ignorados:
+        print(f"Ignorados (nao sao recibos Uber): {len(ignorados)}")
+    for nome in falhas:
+        print(f"Falha ao ler: {nome}")
     if not recibos:
         print(f"Nenhum recibo encontrado em {PASTA_RECIBOS}")
         return
 
+    for layout, qtd in sorted(resumo_layouts(recibos).items(), key=lambda item: str(item[0])):
+        if layout is None or layout.startswith("desconhecido:"):
+            print(f"Layout nao reconhecido ({layout}): {qtd} recibo(s)")
+
     data_yyyymmdd = datetime.now().strftime("%Y%m%d")
     arquivo_saida = f"Relatorio UBER - {data_yyyymmdd}.pdf"
 
-    criar_relatorio_uber(recibos, arquivo_saida)
+    criar_relatorio_uber(recibos, arquivo_saida, textos=textos)
 
     print("\n" + "=" * 50)
     print(f"OK PDF gerado: {arquivo_saida}")
@@ -3,14 +3,251 @@ PDF builder for Uber receipt summary.
 """
 
 from __future__ import annotations
+import hashlib
+import io
 import os
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple, Union
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.rl_accel import fp_str
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase.pdfdoc import xObjectName
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.graphics import renderPDF
+from reportlab.graphics.shapes import Drawing
+from reportlab.pdfgen.canvas import Canvas
+from reportlab.platypus import Flowable, Frame, LayoutError, SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import ArrayObject, DecodedStreamObject, DictionaryObject, NameObject
 from svglib.svglib import svg2rlg
+from data.uber_recibo import DicionarioTextos
+from data.uber_resumo import ResumoRecibos
+from data.uber_table import ReciboTable
+
+
+CORES_PADRAO = {
+    "titulo": "#1F2A37",
+    "texto": "#111827",
+    "meta": "#4B5563",
+    "separador": "#D1D5DB",
+    "resumo_fundo": "#EEF2F7",
+    "cabecalho_fundo": "#F3F4F6",
+    "borda": "#E5E7EB",
+}
+
+
+TITULO_RELATORIO = "Relatório de Reembolso - Uber"
+AUTOR_RELATORIO = "Banco Vittoria"
+MARGEM_H = 1.0 * cm
+MARGEM_V = 1.2 * cm
+# Padding interno dos frames (o padrao do platypus, usado tambem pelo SimpleDocTemplate).
+PADDING_FRAME = 6.0
+RENDERIZADORES = ("platypus", "tabela", "canvas")
+
+# Bloco de cada recibo: nome do estilo do tema para cada linha, float para espaco vertical.
+BLOCO_RECIBO = (
+    "normal", 0.1 * cm,
+    "meta", "meta", 0.16 * cm,
+    "meta", "meta", "meta", 0.16 * cm,
+    "separator", 0.22 * cm,
+)
+SEPARADOR = "-" * 100
+# Alturas das quatro linhas de um recibo no modo tabela (a ultima inclui o espaco ate o separador).
+ALTURAS_TABELA_RECIBO = [16.0, 12.0, 12.0, 18.0]
+
+LOGO_PADRAO = "assets/logo.svg"
+ALTURA_LOGO = 2 * cm
+
+# (caminho absoluto, mtime_ns) -> logo ja lido e escalado (None se o SVG for invalido).
+_LOGOS: Dict[Tuple[str, int], Optional["_Logo"]] = {}
+
+
+class _Logo:
+    """Parsed, scaled logo plus the name of its form XObject."""
+
+    __slots__ = ("drawing", "nome_form")
+
+    def __init__(self, drawing: Drawing, nome_form: str):
+        self.drawing = drawing
+        self.nome_form = nome_form
+
+
+def _carregar_logo(caminho: str) -> Optional[_Logo]:
+    """Logo scaled to ALTURA_LOGO, cached per process by (path, mtime)."""
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    chave = (os.path.abspath(caminho), st.st_mtime_ns)
+    if chave not in _LOGOS:
+        for antiga in [k for k in _LOGOS if k[0] == chave[0]]:
+            del _LOGOS[antiga]
+        try:
+            drawing = svg2rlg(caminho)
+            scale = ALTURA_LOGO / drawing.height
+            drawing.width = drawing.width * scale
+            drawing.height = ALTURA_LOGO
+            drawing.scale(scale, scale)
+            nome_form = "Logo" + hashlib.sha1(repr(chave).encode()).hexdigest()[:12]
+            _LOGOS[chave] = _Logo(drawing, nome_form)
+        except Exception:
+            _LOGOS[chave] = None
+    return _LOGOS[chave]
+
+
+def _desenhar_logo(canvas: Canvas, logo: _Logo, x: float, y: float, escala: float = 1.0) -> None:
+    # O SVG vira um form XObject uma vez por documento; cada uso so referencia o nome.
+    if not canvas.hasForm(logo.nome_form):
+        canvas.beginForm(logo.nome_form, 0, 0, logo.drawing.width, logo.drawing.height)
+        renderPDF.draw(logo.drawing, canvas, 0, 0)
+        canvas.endForm()
+    canvas.saveState()
+    canvas.translate(x, y)
+    canvas.scale(escala, escala)
+    canvas.doForm(logo.nome_form)
+    canvas.restoreState()
+
+
+def _posicao_cabecalho(pagesize: Tuple[float, float], logo: _Logo) -> Tuple[float, float, float]:
+    """(x, y, scale) of the logo drawn at the top of the page."""
+    escala = 0.5
+    largura, altura = pagesize
+    x = (largura - logo.drawing.width * escala) / 2
+    return x, altura - 0.1 * cm - logo.drawing.height * escala, escala
+
+
+def _cabecalho_logo(canvas: Canvas, pagesize: Tuple[float, float], logo: _Logo) -> None:
+    x, y, escala = _posicao_cabecalho(pagesize, logo)
+    _desenhar_logo(canvas, logo, x, y, escala)
+
+
+class _LogoForm(Flowable):
+    """Logo flowable backed by the shared form XObject."""
+
+    def __init__(self, logo: _Logo):
+        super().__init__()
+        self.logo = logo
+        self.width = logo.drawing.width
+        self.height = logo.drawing.height
+        self.hAlign = "CENTER"
+
+    def wrap(self, *args):
+        return self.width, self.height
+
+    def draw(self) -> None:
+        _desenhar_logo(self.canv, self.logo, 0, 0)
+
+
+class TemaRelatorio:
+    """Paragraph and table styles of the report, built once and reused.
+
+    Override colors with `cores` (keys of CORES_PADRAO), fonts or the `logo`
+    SVG path (None for no logo), or subclass
+    and replace any attribute. Instances are read-only in practice and can be
+    shared by any number of reports.
+    """
+
+    def __init__(
+        self,
+        cores: Optional[Dict[str, str]] = None,
+        fonte: str = "Helvetica",
+        fonte_negrito: str = "Helvetica-Bold",
+        logo: Optional[str] = LOGO_PADRAO,
+    ):
+        self.logo = logo
+        paleta = {nome: colors.HexColor(cor) for nome, cor in {**CORES_PADRAO, **(cores or {})}.items()}
+        self.cores = paleta
+        estilos = getSampleStyleSheet()
+        self.titulo = ParagraphStyle(
+            "Titulo",
+            parent=estilos["Heading1"],
+            fontName=fonte_negrito,
+            fontSize=14,
+            textColor=paleta["titulo"],
+        )
+        self.normal = ParagraphStyle(
+            "Normal",
+            parent=estilos["Normal"],
+            fontName=fonte,
+            fontSize=9,
+            textColor=paleta["texto"],
+        )
+        self.meta = ParagraphStyle(
+            "Meta",
+            parent=estilos["Normal"],
+            fontName=fonte,
+            fontSize=8.5,
+            textColor=paleta["meta"],
+        )
+        self.resumo = ParagraphStyle(
+            "Resumo",
+            parent=estilos["Normal"],
+            fontName=fonte_negrito,
+            fontSize=11,
+            textColor=paleta["texto"],
+            alignment=1,
+        )
+        self.separator = ParagraphStyle(
+            "Separator",
+            parent=estilos["Normal"],
+            fontName=fonte,
+            fontSize=7,
+            textColor=paleta["separador"],
+        )
+        self.tabela_resumo = TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, -1), paleta["resumo_fundo"]),
+                ("TEXTCOLOR", (0, 0), (-1, -1), paleta["texto"]),
+                ("FONTNAME", (0, 0), (-1, -1), fonte_negrito),
+                ("FONTSIZE", (0, 0), (-1, -1), 11),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+                ("BOX", (0, 0), (-1, -1), 0.8, paleta["separador"]),
+                ("INNERGRID", (0, 0), (-1, -1), 0.6, paleta["separador"]),
+                ("TOPPADDING", (0, 0), (-1, -1), 6),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
+            ]
+        )
+        # Um recibo no modo tabela: cabecalho | viagem, precos | promocao, origem, destino.
+        self.tabela_recibo = TableStyle(
+            [
+                ("FONT", (0, 0), (-1, -1), fonte, 8.5),
+                ("TEXTCOLOR", (0, 0), (-1, -1), paleta["meta"]),
+                ("FONT", (0, 0), (0, 0), fonte, 9),
+                ("TEXTCOLOR", (0, 0), (0, 0), paleta["texto"]),
+                ("VALIGN", (0, 0), (-1, -1), "TOP"),
+                ("LEFTPADDING", (0, 0), (-1, -1), 0),
+                ("RIGHTPADDING", (0, 0), (-1, -1), 0),
+                ("TOPPADDING", (0, 0), (-1, -1), 1),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 0),
+                ("LINEBELOW", (0, -1), (-1, -1), 0.5, paleta["separador"]),
+                ("NOSPLIT", (0, 0), (-1, -1)),
+            ]
+        )
+        # Totais por mes e por semana usam o mesmo estilo.
+        self.tabela_totais = TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), paleta["cabecalho_fundo"]),
+                ("TEXTCOLOR", (0, 0), (-1, 0), paleta["texto"]),
+                ("FONTNAME", (0, 0), (-1, 0), fonte_negrito),
+                ("FONTSIZE", (0, 0), (-1, -1), 8.8),
+                ("ALIGN", (1, 1), (1, -1), "RIGHT"),
+                ("BOX", (0, 0), (-1, -1), 0.5, paleta["borda"]),
+                ("INNERGRID", (0, 0), (-1, -1), 0.3, paleta["borda"]),
+                ("TOPPADDING", (0, 0), (-1, -1), 4),
+                ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
+            ]
+        )
+
+
+@lru_cache(maxsize=None)
+def tema_padrao() -> TemaRelatorio:
+    """Default theme, built on first use and shared by the whole process."""
+    return TemaRelatorio()
 
 
 def _fmt_currency(value) -> str:
@@ -29,126 +266,76 @@ def _sort_key(recibo: dict) -> str:
     return f"{data}_{hora}"
 
 
-def _fmt_date_range(recibos: list[dict]) -> str:
-    datas = [r.get("data_yyyymmdd") for r in recibos if r.get("data_yyyymmdd")]
-    if not datas:
+def _fmt_date_range(resumo: ResumoRecibos) -> str:
+    periodo = resumo.periodo()
+    if periodo is None:
         return "-"
-    datas_sorted = sorted(datas)
-    start = datas_sorted[0]
-    end = datas_sorted[-1]
-    def _to_br(d: str) -> str:
-        if len(d) != 8:
-            return d
-        return f"{d[6:8]}/{d[4:6]}/{d[0:4]}"
-    return f"{_to_br(start)}–{_to_br(end)}"
-
-
-def _date_from_yyyymmdd(value: str) -> datetime | None:
-    if not value or len(value) != 8:
-        return None
-    try:
-        return datetime.strptime(value, "%Y%m%d")
-    except Exception:
-        return None
+    def _to_br(d: int) -> str:
+        return f"{d % 100:02d}/{d // 100 % 100:02d}/{d // 10000:04d}"
+    return f"{_to_br(periodo[0])}–{_to_br(periodo[1])}"
 
 
-def criar_relatorio_uber(recibos: list[dict], arquivo_saida: str) -> None:
-    doc = SimpleDocTemplate(
-        arquivo_saida,
-        pagesize=A4,
-        leftMargin=1.0 * cm,
-        rightMargin=1.0 * cm,
-        topMargin=1.2 * cm,
-        bottomMargin=1.2 * cm,
-        title="Relatório de Reembolso - Uber",
-        author="Banco Vittoria",
-    )
+def _fmt_mes(mes: int) -> str:
+    return f"{mes % 100:02d}/{mes // 100}"
 
-    estilos = getSampleStyleSheet()
-    titulo = ParagraphStyle(
-        "Titulo",
-        parent=estilos["Heading1"],
-        fontName="Helvetica-Bold",
-        fontSize=14,
-        textColor=colors.HexColor("#1F2A37"),
-    )
-    normal = ParagraphStyle(
-        "Normal",
-        parent=estilos["Normal"],
-        fontName="Helvetica",
-        fontSize=9,
-        textColor=colors.HexColor("#111827"),
-    )
-    meta = ParagraphStyle(
-        "Meta",
-        parent=estilos["Normal"],
-        fontName="Helvetica",
-        fontSize=8.5,
-        textColor=colors.HexColor("#4B5563"),
-    )
-    resumo = ParagraphStyle(
-        "Resumo",
-        parent=estilos["Normal"],
-        fontName="Helvetica-Bold",
-        fontSize=11,
-        textColor=colors.HexColor("#111827"),
-        alignment=1,
-    )
-    separator = ParagraphStyle(
-        "Separator",
-        parent=estilos["Normal"],
-        fontName="Helvetica",
-        fontSize=7,
-        textColor=colors.HexColor("#D1D5DB"),
+
+def _textos_recibo(recibo: dict) -> Tuple[str, ...]:
+    """Lines of a receipt block, in the order of BLOCO_RECIBO."""
+    data_txt = recibo.get("data_texto") or "-"
+    hora_txt = recibo.get("hora") or "-"
+    total_txt = _fmt_currency(recibo.get("total"))
+
+    preco = _fmt_currency(recibo.get("preco_viagem"))
+    taxa = _fmt_currency(recibo.get("taxa_intermediacao"))
+    custo = _fmt_currency(recibo.get("custo_fixo"))
+    promo_val = recibo.get("promocao")
+    promo_fmt = _fmt_currency(promo_val)
+    if promo_fmt != "-" and not str(promo_fmt).startswith("-"):
+        promo_fmt = f"-{promo_fmt}"
+    pagamento = recibo.get("pagamento_linha") or "-"
+
+    categoria = recibo.get("categoria") or "-"
+    distancia = recibo.get("distancia_km") or "-"
+    duracao = recibo.get("duracao_min") or "-"
+    origem = recibo.get("origem") or {}
+    destino = recibo.get("destino") or {}
+
+    return (
+        f"{data_txt} {hora_txt} • Total {total_txt}",
+        f"Preço: {preco} • Taxa: {taxa} • Custo: {custo}",
+        f"Promoção: {promo_fmt} • Pagamento: {pagamento}",
+        f"{categoria} • {distancia} km • {duracao} minutos",
+        f"Origem ({origem.get('hora','-')}): {origem.get('endereco','-')}",
+        f"Destino ({destino.get('hora','-')}): {destino.get('endereco','-')}",
+        SEPARADOR,
     )
 
+
+def _elementos_resumo(tabela: ReciboTable, tema: TemaRelatorio, logo: Optional[_Logo]) -> list:
+    titulo = tema.titulo
+    meta = tema.meta
+    resumo = tema.resumo
+
     elementos = []
     # Logo (opcional)
-    logo_path = "assets/logo.svg"
-    if os.path.exists(logo_path):
-        try:
-            drawing = svg2rlg(logo_path)
-            scale = 2 * cm / drawing.height
-            drawing.width = drawing.width * scale
-            drawing.height = 2 * cm
-            drawing.scale(scale, scale)
-            drawing.hAlign = "CENTER"
-            elementos.append(drawing)
-            elementos.append(Spacer(1, 0.3 * cm))
-        except Exception:
-            elementos.append(Spacer(1, 0.5 * cm))
+    if logo is not None:
+        elementos.append(_LogoForm(logo))
+        elementos.append(Spacer(1, 0.3 * cm))
     else:
         elementos.append(Spacer(1, 0.5 * cm))
 
-    elementos.append(Paragraph("Relatório de Reembolso - Uber", titulo))
+    elementos.append(Paragraph(TITULO_RELATORIO, titulo))
     elementos.append(Spacer(1, 0.3 * cm))
-    recibos_ordenados = sorted(recibos, key=_sort_key)
-    total_viagens = len(recibos_ordenados)
-    total_valor = sum((r.get("total") or 0.0) for r in recibos_ordenados)
+    dados = ResumoRecibos.from_table(tabela)
 
     # Sumario compacto
     resumo_tabela = Table(
-        [[f"{total_viagens} viagens", f"Total {_fmt_currency(total_valor)}"]],
+        [[f"{dados.quantidade} viagens", f"Total {_fmt_currency(dados.total)}"]],
         colWidths=[5.5 * cm, 7.0 * cm],
     )
-    resumo_tabela.setStyle(
-        TableStyle(
-            [
-                ("BACKGROUND", (0, 0), (-1, -1), colors.HexColor("#EEF2F7")),
-                ("TEXTCOLOR", (0, 0), (-1, -1), colors.HexColor("#111827")),
-                ("FONTNAME", (0, 0), (-1, -1), "Helvetica-Bold"),
-                ("FONTSIZE", (0, 0), (-1, -1), 11),
-                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
-                ("BOX", (0, 0), (-1, -1), 0.8, colors.HexColor("#D1D5DB")),
-                ("INNERGRID", (0, 0), (-1, -1), 0.6, colors.HexColor("#D1D5DB")),
-                ("TOPPADDING", (0, 0), (-1, -1), 6),
-                ("BOTTOMPADDING", (0, 0), (-1, -1), 6),
-            ]
-        )
-    )
+    resumo_tabela.setStyle(tema.tabela_resumo)
     resumo_tabela.hAlign = "CENTER"
-    periodo = _fmt_date_range(recibos_ordenados)
+    periodo = _fmt_date_range(dados)
     elementos.append(Paragraph("Resumo geral", resumo))
     elementos.append(Spacer(1, 0.15 * cm))
     elementos.append(resumo_tabela)
@@ -156,103 +343,385 @@ def criar_relatorio_uber(recibos: list[dict], arquivo_saida: str) -> None:
     elementos.append(Paragraph(f"Período: {periodo}", meta))
     elementos.append(Spacer(1, 0.25 * cm))
 
-    # Estatisticas por mes e semana
-    month_totals = {}
-    week_totals = {}
-    for r in recibos_ordenados:
-        d = _date_from_yyyymmdd(r.get("data_yyyymmdd"))
-        if not d:
-            continue
-        month_key = d.strftime("%m/%Y")
-        total = float(r.get("total") or 0.0)
-        month_totals[month_key] = month_totals.get(month_key, 0.0) + total
-        week_idx = ((d.day - 1) // 7) + 1
-        week_key = f"{month_key} • Semana {week_idx}"
-        week_totals[week_key] = week_totals.get(week_key, 0.0) + total
-
-    if month_totals:
+    # Estatisticas por mes e semana (chaves inteiras: ordem cronologica)
+    if dados.por_mes:
         elementos.append(Spacer(1, 0.15 * cm))
         elementos.append(Paragraph("Totais por mês", meta))
         month_rows = [["Mês", "Total"]]
-        for mes in sorted(month_totals.keys()):
-            month_rows.append([mes, _fmt_currency(month_totals[mes])])
+        for mes, total in dados.meses():
+            month_rows.append([_fmt_mes(mes), _fmt_currency(total)])
         tabela_mes = Table(month_rows, colWidths=[4.0 * cm, 4.5 * cm])
-        tabela_mes.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#F3F4F6")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#111827")),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 8.8),
-                    ("ALIGN", (1, 1), (1, -1), "RIGHT"),
-                    ("BOX", (0, 0), (-1, -1), 0.5, colors.HexColor("#E5E7EB")),
-                    ("INNERGRID", (0, 0), (-1, -1), 0.3, colors.HexColor("#E5E7EB")),
-                    ("TOPPADDING", (0, 0), (-1, -1), 4),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-                ]
-            )
-        )
+        tabela_mes.setStyle(tema.tabela_totais)
         elementos.append(tabela_mes)
 
-    if week_totals:
+    if dados.por_semana:
         elementos.append(Spacer(1, 0.2 * cm))
         elementos.append(Paragraph("Totais por semana (do mês)", meta))
         week_rows = [["Mês/Semana", "Total"]]
-        for semana in sorted(week_totals.keys()):
-            week_rows.append([semana, _fmt_currency(week_totals[semana])])
+        for mes, semana, total in dados.semanas():
+            week_rows.append([f"{_fmt_mes(mes)} • Semana {semana}", _fmt_currency(total)])
         tabela_semana = Table(week_rows, colWidths=[6.2 * cm, 2.3 * cm])
-        tabela_semana.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#F3F4F6")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.HexColor("#111827")),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, -1), 8.8),
-                    ("ALIGN", (1, 1), (1, -1), "RIGHT"),
-                    ("BOX", (0, 0), (-1, -1), 0.5, colors.HexColor("#E5E7EB")),
-                    ("INNERGRID", (0, 0), (-1, -1), 0.3, colors.HexColor("#E5E7EB")),
-                    ("TOPPADDING", (0, 0), (-1, -1), 4),
-                    ("BOTTOMPADDING", (0, 0), (-1, -1), 4),
-                ]
-            )
-        )
+        tabela_semana.setStyle(tema.tabela_totais)
         elementos.append(tabela_semana)
 
+    if dados.por_categoria:
+        elementos.append(Spacer(1, 0.2 * cm))
+        elementos.append(Paragraph("Totais por categoria", meta))
+        categoria_rows = [["Categoria", "Viagens", "Total"]]
+        for categoria, viagens, total in dados.categorias():
+            categoria_rows.append([categoria or "-", str(viagens), _fmt_currency(total)])
+        tabela_categoria = Table(categoria_rows, colWidths=[4.2 * cm, 1.8 * cm, 2.5 * cm])
+        tabela_categoria.setStyle(tema.tabela_totais)
+        tabela_categoria.setStyle([("ALIGN", (2, 1), (2, -1), "RIGHT")])
+        elementos.append(tabela_categoria)
+
     elementos.append(Spacer(1, 0.35 * cm))
+    return elementos
+
+
+def _elementos_recibo(recibo: dict, tema: TemaRelatorio) -> list:
+    textos = iter(_textos_recibo(recibo))
+    return [
+        Spacer(1, passo) if isinstance(passo, float) else Paragraph(next(textos), getattr(tema, passo))
+        for passo in BLOCO_RECIBO
+    ]
+
+
+def _linhas_tabela(recibo: dict, largura: float, tema: TemaRelatorio) -> Tuple[List[List[Optional[str]]], List[float]]:
+    """Cells and row heights of one receipt; origin and destination wrap onto extra lines."""
+    cabecalho, precos, promocao, viagem, origem, destino, _ = _textos_recibo(recibo)
+    meta = tema.meta
+    coluna = largura / 2
+    origem, linhas_origem = _quebrar(origem, meta.fontName, meta.fontSize, largura)
+    destino, linhas_destino = _quebrar(destino, meta.fontName, meta.fontSize, largura)
+    # FONT sem leading explicito (tabela_recibo) usa 1,2 x o tamanho entre as linhas de uma celula.
+    entrelinha = meta.fontSize * 1.2
+    alturas = list(ALTURAS_TABELA_RECIBO)
+    alturas[2] += (linhas_origem - 1) * entrelinha
+    alturas[3] += (linhas_destino - 1) * entrelinha
+    linhas = [
+        [_caber(cabecalho, tema.normal.fontName, tema.normal.fontSize, coluna), _caber(viagem, meta.fontName, meta.fontSize, coluna)],
+        [_caber(precos, meta.fontName, meta.fontSize, coluna), _caber(promocao, meta.fontName, meta.fontSize, coluna)],
+        [origem, None],
+        [destino, None],
+    ]
+    return linhas, alturas
+
+
+def _tabelas_recibos(recibos: List[dict], largura: float, tema: TemaRelatorio) -> List[Table]:
+    """One small pre-styled Table per receipt, all sharing tema.tabela_recibo."""
+    tabelas = []
+    for recibo in recibos:
+        linhas, alturas = _linhas_tabela(recibo, largura, tema)
+        tabela = Table(
+            linhas,
+            colWidths=[largura / 2, largura / 2],
+            rowHeights=alturas,
+            style=tema.tabela_recibo,
+        )
+        tabela.hAlign = "LEFT"
+        tabelas.append(tabela)
+    return tabelas
+
+
+def _cabe(texto: str, fonte: str, tamanho: float, largura: float) -> bool:
+    # Nenhum glifo das fontes padrao passa de ~1,02 em: linhas curtas nem sao medidas.
+    return len(texto) * tamanho * 1.05 <= largura or stringWidth(texto, fonte, tamanho) <= largura
+
+
+def _caber(texto: str, fonte: str, tamanho: float, largura: float) -> str:
+    """Shorten `texto` with an ellipsis so it fits in `largura` points."""
+    if _cabe(texto, fonte, tamanho, largura):
+        return texto
+    while texto and stringWidth(texto + "…", fonte, tamanho) > largura:
+        texto = texto[:-1]
+    return texto + "…"
+
+
+def _quebrar(texto: str, fonte: str, tamanho: float, largura: float) -> Tuple[str, int]:
+    """Wrap `texto` at spaces to `largura` points; returns (text with newlines, line count)."""
+    if _cabe(texto, fonte, tamanho, largura):
+        return texto, 1
+    linhas = simpleSplit(texto, fonte, tamanho, largura)
+    return "\n".join(linhas), len(linhas)
+
+
+class _Posicao(Flowable):
+    """Zero-size marker that records where the frame placed it."""
+
+    y: Optional[float] = None
+
+    def wrap(self, *args):
+        return 0, 0
+
+    def drawOn(self, canvas, x, y, _sW=0) -> None:
+        self.y = y
+
+
+def _frame_pagina(largura: float, altura: float) -> Frame:
+    return Frame(
+        MARGEM_H,
+        MARGEM_V,
+        largura - 2 * MARGEM_H,
+        altura - 2 * MARGEM_V,
+        leftPadding=PADDING_FRAME,
+        bottomPadding=PADDING_FRAME,
+        rightPadding=PADDING_FRAME,
+        topPadding=PADDING_FRAME,
+    )
+
 
-    for recibo in recibos_ordenados:
-        data_txt = recibo.get("data_texto") or "-"
-        hora_txt = recibo.get("hora") or "-"
-        total_txt = _fmt_currency(recibo.get("total"))
-        elementos.append(Paragraph(f"{data_txt} {hora_txt} • Total {total_txt}", normal))
-        elementos.append(Spacer(1, 0.1 * cm))
-
-        preco = _fmt_currency(recibo.get("preco_viagem"))
-        taxa = _fmt_currency(recibo.get("taxa_intermediacao"))
-        custo = _fmt_currency(recibo.get("custo_fixo"))
-        promo_val = recibo.get("promocao")
-        promo_fmt = _fmt_currency(promo_val)
-        if promo_fmt != "-" and not str(promo_fmt).startswith("-"):
-            promo_fmt = f"-{promo_fmt}"
-        pagamento = recibo.get("pagamento_linha") or "-"
-
-        elementos.append(Paragraph(f"Preço: {preco} • Taxa: {taxa} • Custo: {custo}", meta))
-        elementos.append(Paragraph(f"Promoção: {promo_fmt} • Pagamento: {pagamento}", meta))
-        elementos.append(Spacer(1, 0.16 * cm))
-
-        categoria = recibo.get("categoria") or "-"
-        distancia = recibo.get("distancia_km") or "-"
-        duracao = recibo.get("duracao_min") or "-"
-        origem = recibo.get("origem") or {}
-        destino = recibo.get("destino") or {}
-
-        viagem_info = f"{categoria} • {distancia} km • {duracao} minutos"
-        elementos.append(Paragraph(viagem_info, meta))
-        elementos.append(Paragraph(f"Origem ({origem.get('hora','-')}): {origem.get('endereco','-')}", meta))
-        elementos.append(Paragraph(f"Destino ({destino.get('hora','-')}): {destino.get('endereco','-')}", meta))
-        elementos.append(Spacer(1, 0.16 * cm))
-
-        elementos.append(Paragraph("-" * 100, separator))
-        elementos.append(Spacer(1, 0.22 * cm))
-
-    doc.build(elementos)
+def _renderizar_canvas(
+    saida: Union[str, BinaryIO],
+    resumo: list,
+    recibos: Iterable[dict],
+    tema: TemaRelatorio,
+    logo: Optional[_Logo],
+    logo_em_todas_paginas: bool,
+) -> None:
+    largura, altura = A4
+    canvas = Canvas(saida, pagesize=A4)
+    canvas.setTitle(TITULO_RELATORIO)
+    canvas.setAuthor(AUTOR_RELATORIO)
+    cabecalho = logo is not None and logo_em_todas_paginas
+
+    def _nova_pagina() -> None:
+        canvas.showPage()
+        if cabecalho:
+            _cabecalho_logo(canvas, A4, logo)
+
+    # O resumo continua em flowables (tabelas de tamanho variavel, pode quebrar pagina).
+    # A copia preserva a lista do chamador; o marcador no fim diz onde o resumo terminou.
+    fim_resumo = _Posicao()
+    pendentes = [*resumo, fim_resumo]
+    frame = _frame_pagina(largura, altura)
+    pagina_vazia = True
+    while pendentes:
+        if frame.add(pendentes[0], canvas):
+            del pendentes[0]
+            pagina_vazia = False
+            continue
+        partes = frame.split(pendentes[0], canvas)
+        if partes:
+            pendentes[:1] = partes
+        elif pagina_vazia:
+            raise LayoutError(f"{pendentes[0].identity()} nao cabe numa pagina")
+        else:
+            _nova_pagina()
+            frame = _frame_pagina(largura, altura)
+            pagina_vazia = True
+
+    # Mesmas medidas do layout platypus: baseline = topo da linha - fontSize.
+    linhas = []
+    deslocamento = 0.0
+    for passo in BLOCO_RECIBO:
+        if isinstance(passo, float):
+            deslocamento += passo
+        else:
+            estilo = getattr(tema, passo)
+            linhas.append((estilo, deslocamento + estilo.fontSize))
+            deslocamento += estilo.leading
+    altura_bloco = deslocamento
+    esquerda = MARGEM_H + PADDING_FRAME
+    largura_util = largura - 2 * MARGEM_H - 2 * PADDING_FRAME
+    topo_pagina = altura - MARGEM_V - PADDING_FRAME
+    base = MARGEM_V + PADDING_FRAME
+
+    y = fim_resumo.y
+    for recibo in recibos:
+        if y - altura_bloco < base:
+            _nova_pagina()
+            y = topo_pagina
+        texto = canvas.beginText()
+        atual = None
+        for (estilo, baseline), linha in zip(linhas, _textos_recibo(recibo)):
+            if estilo is not atual:
+                texto.setFont(estilo.fontName, estilo.fontSize)
+                texto.setFillColor(estilo.textColor)
+                atual = estilo
+            texto.setTextOrigin(esquerda, y - baseline)
+            texto.textOut(_caber(linha, estilo.fontName, estilo.fontSize, largura_util))
+        canvas.drawText(texto)
+        y -= altura_bloco
+
+    canvas.showPage()
+    canvas.save()
+
+
+def _renderizar(
+    saida: Union[str, BinaryIO],
+    elementos: list,
+    recibos: List[dict],
+    tema: TemaRelatorio,
+    renderizador: str,
+    logo: Optional[_Logo],
+    logo_em_todas_paginas: bool,
+) -> None:
+    """Lay out `elementos` (the summary, possibly empty) followed by `recibos`."""
+    if renderizador == "canvas":
+        _renderizar_canvas(saida, elementos, recibos, tema, logo, logo_em_todas_paginas)
+        return
+
+    doc = SimpleDocTemplate(
+        saida,
+        pagesize=A4,
+        leftMargin=MARGEM_H,
+        rightMargin=MARGEM_H,
+        topMargin=MARGEM_V,
+        bottomMargin=MARGEM_V,
+        title=TITULO_RELATORIO,
+        author=AUTOR_RELATORIO,
+    )
+    if renderizador == "tabela":
+        if recibos:
+            elementos.extend(_tabelas_recibos(recibos, doc.width - 2 * PADDING_FRAME, tema))
+    else:
+        for recibo in recibos:
+            elementos.extend(_elementos_recibo(recibo, tema))
+
+    paginas = {}
+    if logo is not None and logo_em_todas_paginas:
+        paginas["onLaterPages"] = lambda canvas, doc: _cabecalho_logo(canvas, doc.pagesize, logo)
+    doc.build(elementos, **paginas)
+
+
+def _renderizar_parte(recibos: List[dict], tema: TemaRelatorio, renderizador: str) -> bytes:
+    """Render a slice of the receipt list as a standalone PDF (runs in a worker).
+
+    Parts carry no logo: _carimbar_logo adds the header after the merge.
+    """
+    buffer = io.BytesIO()
+    _renderizar(buffer, [], recibos, tema, renderizador, None, False)
+    return buffer.getvalue()
+
+
+def _carimbar_logo(writer: PdfWriter, logo: _Logo, inicio: int) -> None:
+    """Draw the header logo on writer.pages[inicio:] with the summary's form XObject.
+
+    The summary (page 0) always holds the logo form; every stamped page
+    references that one object and the same content stream, so the merged
+    file carries a single copy of the logo.
+    """
+    nome = NameObject("/" + xObjectName(logo.nome_form))
+    form = writer.pages[0]["/Resources"]["/XObject"].raw_get(nome)
+    x, y, escala = _posicao_cabecalho(A4, logo)
+    # Antes do conteudo original, como no cabecalho desenhado pelo canvas; q/Q isola o estado grafico.
+    desenho = DecodedStreamObject()
+    desenho.set_data(f"q\n{fp_str(escala, 0, 0, escala, x, y)} cm\n{nome} Do\nQ\n".encode())
+    desenho = writer._add_object(desenho)
+    for pagina in writer.pages[inicio:]:
+        recursos = pagina["/Resources"]
+        if "/XObject" not in recursos:
+            recursos[NameObject("/XObject")] = DictionaryObject()
+        recursos["/XObject"][nome] = form
+        conteudo = pagina.raw_get("/Contents")
+        partes = list(conteudo.get_object()) if isinstance(conteudo.get_object(), ArrayObject) else [conteudo]
+        pagina[NameObject("/Contents")] = ArrayObject([desenho, *partes])
+
+
+def _renderizar_em_partes(
+    saida: Union[str, BinaryIO],
+    elementos: list,
+    recibos: List[dict],
+    tema: TemaRelatorio,
+    renderizador: str,
+    logo: Optional[_Logo],
+    logo_em_todas_paginas: bool,
+    workers: int,
+    recibos_por_parte: int,
+) -> None:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        partes = [
+            pool.submit(_renderizar_parte, recibos[i : i + recibos_por_parte], tema, renderizador)
+            for i in range(0, len(recibos), recibos_por_parte)
+        ]
+        # O resumo e montado aqui enquanto os workers renderizam os recibos.
+        resumo = io.BytesIO()
+        _renderizar(resumo, elementos, [], tema, renderizador, logo, logo_em_todas_paginas)
+
+        writer = PdfWriter()
+        writer.append(PdfReader(resumo))
+        paginas_resumo = len(writer.pages)
+        for parte in partes:
+            writer.append(PdfReader(io.BytesIO(parte.result())))
+    if logo is not None and logo_em_todas_paginas:
+        _carimbar_logo(writer, logo, paginas_resumo)
+    writer.add_metadata({"/Title": TITULO_RELATORIO, "/Author": AUTOR_RELATORIO})
+    # Cada parte traz suas proprias copias das fontes (o logo ja e um objeto so).
+    writer.compress_identical_objects()
+    if isinstance(saida, str) or _pesquisavel(saida):
+        writer.write(saida)
+    else:
+        # pypdf usa tell() para montar o xref; sockets e pipes recebem o PDF pronto.
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        saida.write(buffer.getbuffer())
+
+
+def _pesquisavel(saida: BinaryIO) -> bool:
+    try:
+        return saida.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def criar_relatorio_uber(
+    recibos: list[dict],
+    arquivo_saida: Union[str, BinaryIO, None] = None,
+    tema: Optional[TemaRelatorio] = None,
+    logo_em_todas_paginas: bool = False,
+    renderizador: str = "platypus",
+    workers: int = 1,
+    recibos_por_parte: int = 2000,
+    textos: Optional[DicionarioTextos] = None,
+) -> Optional[bytes]:
+    """Write the reimbursement report for `recibos` to `arquivo_saida`.
+
+    `arquivo_saida` is a path or any binary object with write() (BytesIO,
+    an open file, socket.makefile("wb"), an HTTP response body); it is
+    written to but not closed. With None the PDF is built in memory and
+    returned as bytes, so nothing touches the disk.
+
+    `renderizador="tabela"` renders each receipt as one pre-styled four-row
+    Table (header and trip, prices and payment, origin, destination) instead
+    of about a dozen flowables; long addresses wrap onto extra lines, the
+    two half-width rows are shortened with an ellipsis. `renderizador="canvas"` draws the receipt
+    list straight onto the PDF canvas in fixed-height blocks (lines too long
+    for the page are shortened instead of wrapped), so render time and
+    memory per receipt stay flat for very large reports. The summary
+    section is the same in every mode.
+
+    With `workers` > 1 and more than `recibos_por_parte` receipts, the
+    receipt list is split into parts of that size, rendered in worker
+    processes and merged with pypdf after the summary. Each part then starts
+    on a new page.
+
+    Pass the DicionarioTextos used by the loader as `textos` so the summary
+    table encodes categories and payments with the batch codes instead of
+    building a second dictionary.
+    """
+    if renderizador not in RENDERIZADORES:
+        raise ValueError(f"renderizador desconhecido: {renderizador!r}")
+    if tema is None:
+        tema = tema_padrao()
+    logo = _carregar_logo(tema.logo) if tema.logo else None
+    recibos_ordenados = sorted(recibos, key=_sort_key)
+    tabela = ReciboTable.from_recibos(recibos_ordenados, textos)
+    elementos = _elementos_resumo(tabela, tema, logo)
+
+    saida = io.BytesIO() if arquivo_saida is None else arquivo_saida
+    if workers > 1 and len(recibos_ordenados) > recibos_por_parte:
+        _renderizar_em_partes(
+            saida,
+            elementos,
+            recibos_ordenados,
+            tema,
+            renderizador,
+            logo,
+            logo_em_todas_paginas,
+            workers,
+            recibos_por_parte,
+        )
+    else:
+        _renderizar(saida, elementos, recibos_ordenados, tema, renderizador, logo, logo_em_todas_paginas)
+    return saida.getvalue() if arquivo_saida is None else None
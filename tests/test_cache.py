@@ -0,0 +1,38 @@
+"""
+ReciboCache text ids: only committed ids reach the in-memory maps.
+"""
+
+import shutil
+import tempfile
+import unittest
+
+from data.uber_cache import ReciboCache
+
+
+class TextosCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_rollback_descarta_ids(self):
+        with ReciboCache(self.dir) as cache:
+            # O set nao vira JSON: a transacao cai depois de criar o id de "UberX".
+            with self.assertRaises(TypeError):
+                cache.put("a" * 64, "2", {"categoria": "UberX", "extra": {1}})
+            self.assertEqual(cache._id_por_texto, {})
+            self.assertEqual(cache._texto_por_id, {})
+            self.assertEqual(cache._conn.execute("SELECT COUNT(*) FROM textos").fetchone()[0], 0)
+
+            cache.put("b" * 64, "2", {"categoria": "Comfort", "pagamento_linha": "Pix"})
+            self.assertEqual(cache.get("b" * 64, "2"), {"categoria": "Comfort", "pagamento_linha": "Pix"})
+            linhas = dict(cache._conn.execute("SELECT valor, id FROM textos"))
+            self.assertEqual(cache._id_por_texto, linhas)
+
+        with ReciboCache(self.dir) as cache:
+            self.assertEqual(cache.get("b" * 64, "2"), {"categoria": "Comfort", "pagamento_linha": "Pix"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+The single-pass field extractor must match the original line-by-line scans.
+"""
+
+import random
+import re
+import unittest
+
+from data.uber_loader import _clean_text, _extract_currency_from_line, _extrair_linhas, _norm_text
+
+# Linhas de recibo (e variacoes que confundem as ancoras) usadas para montar sequencias aleatorias.
+VOCABULARIO = [
+    "12 de março de 2025", "3 de jan. de 2024", "1 de dezembro", "14:32", "9:05", "14:35", "7:5",
+    "Total", "Total R$ 25,90", "R$ 25,90", "R$ 1.234,56", "-R$ 3,50", "12,00", "Subtotal",
+    "Preço da viagem", "Preço da viagem R$ 20,00", "Taxa de intermediação", "Taxa de intermediação R$ 3,00",
+    "Custo fixo", "Custo fixo R$ 2,90", "Promoção", "Promoção -R$ 5,00", "Promoções aplicadas",
+    "Pagamentos", "Pagamentos recebidos", "Visa ••••1234", "Pix",
+    "Informações da viagem", "UberX", "Uber Comfort", "5.2 quilometros, 18 minutes",
+    "12.75 quilometros, 41 minutes", "Rua Augusta, 1500 - Consolação", "Av. Paulista, 1000",
+    "Você viajou com João", "voce viajou", "Obrigado por viajar", "Total da viagem",
+]
+
+
+def _find_value_after_keyword(lines, key):
+    for i, line in enumerate(lines):
+        if key in _norm_text(line):
+            value = _extract_currency_from_line(line)
+            if value is not None:
+                return value
+            if i + 1 < len(lines):
+                value = _extract_currency_from_line(lines[i + 1])
+                if value is not None:
+                    return value
+    return None
+
+
+def _extrair_antigo(lines):
+    """Frozen copy of the scans carregar_recibo_uber ran before the declarative extractor."""
+    data_str = None
+    hora_str = None
+    for i, line in enumerate(lines):
+        if re.match(r"^\d{1,2} de ", _norm_text(line)) and " de " in _norm_text(line):
+            data_str = _clean_text(line)
+            if i + 1 < len(lines) and re.match(r"^\d{1,2}:\d{2}$", lines[i + 1]):
+                hora_str = _clean_text(lines[i + 1])
+            break
+
+    pagamento_linha = None
+    for i, line in enumerate(lines):
+        if _norm_text(line) == "pagamentos":
+            if i + 1 < len(lines):
+                pagamento_linha = _clean_text(lines[i + 1])
+            break
+
+    categoria = distancia = duracao = None
+    for i, line in enumerate(lines):
+        if _norm_text(line) == "informacoes da viagem":
+            if i + 1 < len(lines):
+                categoria = _clean_text(lines[i + 1])
+            if i + 2 < len(lines):
+                m = re.search(r"([0-9.]+)\s*quilometros,\s*(\d+)\s*minutes", _norm_text(lines[i + 2]))
+                if m:
+                    distancia, duracao = m.group(1), m.group(2)
+            break
+
+    pontos = []
+    time_re = re.compile(r"^\d{1,2}:\d{2}$")
+    start_idx = 0
+    for i, line in enumerate(lines):
+        if _norm_text(line) == "informacoes da viagem":
+            start_idx = i + 1
+            break
+    i = start_idx
+    while i < len(lines):
+        if time_re.match(lines[i]):
+            hora = _clean_text(lines[i])
+            addr_lines = []
+            j = i + 1
+            while j < len(lines) and not time_re.match(lines[j]):
+                if _norm_text(lines[j]).startswith("voce viajou"):
+                    break
+                addr_lines.append(_clean_text(lines[j]))
+                j += 1
+            pontos.append({"hora": hora, "endereco": " ".join(addr_lines).strip()})
+            i = j
+            if len(pontos) >= 2:
+                break
+        else:
+            i += 1
+
+    return {
+        "data_texto": data_str,
+        "hora": hora_str,
+        "total": _find_value_after_keyword(lines, "total"),
+        "preco_viagem": _find_value_after_keyword(lines, "preco da viagem"),
+        "taxa_intermediacao": _find_value_after_keyword(lines, "taxa de intermediacao"),
+        "custo_fixo": _find_value_after_keyword(lines, "custo fixo"),
+        "promocao": _find_value_after_keyword(lines, "promocao"),
+        "pagamento_linha": pagamento_linha,
+        "categoria": categoria,
+        "distancia_km": distancia,
+        "duracao_min": duracao,
+        "pontos": pontos,
+    }
+
+
+def _extrair_novo(lines):
+    valores, pontos, _ = _extrair_linhas(lines, [_norm_text(line) for line in lines])
+    return {**valores, "pontos": [p.to_dict() for p in pontos]}
+
+
+class ExtracaoTest(unittest.TestCase):
+    def test_sequencias_aleatorias(self):
+        rnd = random.Random(3)
+        for _ in range(5000):
+            lines = [rnd.choice(VOCABULARIO) for _ in range(rnd.randint(0, 30))]
+            self.assertEqual(_extrair_novo(lines), _extrair_antigo(lines), lines)
+
+    def test_recibo_completo(self):
+        lines = [
+            "12 de março de 2025", "14:32", "Total", "R$ 25,90", "Preço da viagem", "R$ 20,00",
+            "Pagamentos", "Visa ••••1234", "Informações da viagem", "UberX", "5.2 quilometros, 18 minutes",
+            "14:35", "Rua A, 100", "14:53", "Rua B, 200", "Você viajou com Fulano",
+        ]
+        valores, pontos, completo = _extrair_linhas(lines, [_norm_text(line) for line in lines])
+        self.assertTrue(completo)
+        self.assertEqual(valores["total"], 25.9)
+        self.assertEqual([p.endereco for p in pontos], ["Rua A, 100", "Rua B, 200"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+"""
+_norm_text (translate fast path) must match the original NFKD normalization.
+"""
+
+import os
+import random
+import re
+import unicodedata
+import unittest
+
+from data.uber_loader import _norm_text
+
+CORPUS = os.path.join(os.path.dirname(__file__), "dados", "linhas_recibo.txt")
+
+
+def _norm_text_nfkd(value: str) -> str:
+    """Frozen copy of the original _norm_text."""
+    value = unicodedata.normalize("NFKD", str(value))
+    value = "".join(c for c in value if not unicodedata.combining(c))
+    value = value.replace("\ufffd", "")
+    value = value.lower()
+    value = re.sub(r"\s+", " ", value)
+    return value.strip()
+
+
+def _linhas_corpus():
+    with open(CORPUS, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+class NormTextTest(unittest.TestCase):
+    def test_linhas_de_recibo(self):
+        for linha in _linhas_corpus():
+            with self.subTest(linha=linha):
+                self.assertEqual(_norm_text(linha), _norm_text_nfkd(linha))
+
+    def test_strings_aleatorias(self):
+        rnd = random.Random(4)
+        # ASCII, espacos, Latin-1/Extended, marcas combinantes, grego, pontuacao, compatibilidade, CJK, Hangul.
+        alfabeto = (
+            [chr(c) for c in range(0x20, 0x7F)]
+            + list(" \t\n\r\x0b\x0c\x1c\x85\xa0\u2003\u3000")
+            + [chr(c) for c in range(0x80, 0x250)]
+            + [chr(c) for c in range(0x300, 0x400)]
+            + [chr(c) for c in range(0x2000, 0x2200)]
+            + list("\ufffd\ufb01\ufb02\u2122\u2460\u338f\uff76\uff9e\uff21\uac00\ud7a3\u4e2d\u0130\u017f\u1e9e")
+        )
+        for _ in range(20000):
+            valor = "".join(rnd.choice(alfabeto) for _ in range(rnd.randint(0, 40)))
+            self.assertEqual(_norm_text(valor), _norm_text_nfkd(valor), repr(valor))
+
+    def test_nao_string(self):
+        self.assertEqual(_norm_text(12.5), "12.5")
+
+
+if __name__ == "__main__":
+    unittest.main()
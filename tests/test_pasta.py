@@ -0,0 +1,193 @@
+"""
+iter_recibos_pasta on generated PDFs: manifest, cache counters, outcome replay
+and identical receipts across worker counts and re-runs.
+"""
+
+import os
+import io
+import shutil
+import tarfile
+import tempfile
+import unittest
+import zipfile
+from unittest import mock
+
+from reportlab.pdfgen import canvas
+
+from data.uber_cache import ReciboCache
+from data import uber_loader
+from data.uber_loader import iter_recibos_pasta
+from data.uber_recibo import DicionarioTextos
+from data.uber_table import ReciboTable
+
+N_RECIBOS = 6
+
+
+def _gerar_recibo(caminho: str, i: int) -> None:
+    linhas = [
+        "Uber",
+        f"{i % 28 + 1} de março de 2025",
+        "14:32",
+        f"Total R$ {10 + i},90",
+        "Preço da viagem R$ 20,00",
+        "Pagamentos",
+        f"Visa {1000 + i}",
+        "Informações da viagem",
+        "UberX",
+        "5.2 quilometros, 18 minutes",
+        "14:35",
+        f"Rua Augusta, {100 + i} - Consolação",
+        "14:53",
+        "Av. Paulista, 1000",
+    ]
+    c = canvas.Canvas(caminho, invariant=1)
+    y = 800
+    for linha in linhas:
+        c.drawString(50, y, linha)
+        y -= 16
+    c.save()
+
+
+def _gerar_outro(caminho: str) -> None:
+    c = canvas.Canvas(caminho, invariant=1)
+    c.drawString(50, 800, "Fatura de energia")
+    c.save()
+
+
+class IterRecibosPastaTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.pasta = os.path.join(self.dir, "recibos")
+        os.mkdir(self.pasta)
+        for i in range(N_RECIBOS):
+            _gerar_recibo(os.path.join(self.pasta, f"recibo_{i:02d}.pdf"), i)
+        _gerar_outro(os.path.join(self.pasta, "outro.pdf"))
+        with open(os.path.join(self.pasta, "quebrado.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n1 0 obj\n<<")
+        self.caminho_cache = os.path.join(self.dir, "cache")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _rodar(self, cache=None, **kwargs):
+        resultados = []
+        recibos = list(iter_recibos_pasta(self.pasta, cache=cache, resultados=resultados, **kwargs))
+        status = {r.arquivo: r.status for r in resultados}
+        return [r.to_dict() for r in recibos], status
+
+    def test_workers_iguais(self):
+        um, status_um = self._rodar(workers=1)
+        dois, status_dois = self._rodar(workers=2)
+        self.assertEqual(len(um), N_RECIBOS)
+        self.assertEqual(um, dois)
+        self.assertEqual(status_um, status_dois)
+        self.assertEqual(status_um["outro.pdf"], "ignorado")
+        self.assertEqual(status_um["quebrado.pdf"], "falha")
+
+    def test_manifesto_repete_resultados(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                shutil.rmtree(self.caminho_cache, ignore_errors=True)
+                cache = ReciboCache(self.caminho_cache)
+                primeira, status = self._rodar(cache, workers=workers)
+                # outro.pdf e quebrado.pdf tambem consultam o cache (e nao acham nada).
+                self.assertEqual((cache.hits, cache.misses), (0, N_RECIBOS + 2))
+
+                cache = ReciboCache(self.caminho_cache)
+                segunda, status_segunda = self._rodar(cache, workers=workers)
+                self.assertEqual(segunda, primeira)
+                # Nada e reaberto: recibos voltam do manifesto, recusas e falhas com o status original.
+                self.assertEqual((cache.hits, cache.misses), (0, 0))
+                self.assertEqual(status_segunda["outro.pdf"], "ignorado")
+                self.assertEqual(status_segunda["quebrado.pdf"], "falha")
+                self.assertEqual(
+                    {nome: s for nome, s in status_segunda.items() if nome.startswith("recibo_")},
+                    {nome: "manifesto" for nome in status if nome.startswith("recibo_")},
+                )
+
+    def test_mtime_alterado_usa_cache_de_conteudo(self):
+        cache = ReciboCache(self.caminho_cache)
+        primeira, _ = self._rodar(cache, workers=1)
+        for nome in os.listdir(self.pasta):
+            caminho = os.path.join(self.pasta, nome)
+            st = os.stat(caminho)
+            os.utime(caminho, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        cache = ReciboCache(self.caminho_cache)
+        segunda, status = self._rodar(cache, workers=2)
+        self.assertEqual(segunda, primeira)
+        self.assertEqual((cache.hits, cache.misses), (N_RECIBOS, 2))
+        self.assertEqual({s for nome, s in status.items() if nome.startswith("recibo_")}, {"cache"})
+
+    def test_textos_compartilhados(self):
+        textos = DicionarioTextos()
+        recibos = list(iter_recibos_pasta(self.pasta, workers=2, textos=textos))
+        conhecidos = len(textos)
+        tabela = ReciboTable.from_recibos(recibos, textos)
+        # O loader ja internou categoria e pagamento: a tabela so reusa os codigos.
+        self.assertEqual(len(textos), conhecidos)
+        self.assertEqual([textos.valores[c] for c in tabela.cod_categoria], [r.categoria for r in recibos])
+
+    def test_backend_auto_gravado_no_cache(self):
+        cache = ReciboCache(self.caminho_cache)
+        primeira, _ = self._rodar(cache, workers=1, backend="auto")
+        cache = ReciboCache(self.caminho_cache)
+        # A escolha vem do cache: a amostra nao e comparada de novo e o carimbo nao muda.
+        with mock.patch.object(uber_loader, "escolher_backend", side_effect=AssertionError):
+            segunda, status = self._rodar(cache, workers=1, backend="auto")
+        self.assertEqual(segunda, primeira)
+        self.assertEqual({s for nome, s in status.items() if nome.startswith("recibo_")}, {"manifesto"})
+
+    def test_parar(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                recibos = []
+                for recibo in iter_recibos_pasta(self.pasta, workers=workers, parar=lambda: len(recibos) >= 2):
+                    recibos.append(recibo)
+                self.assertEqual(len(recibos), 2)
+
+    def test_compactado(self):
+        compactado = os.path.join(self.pasta, "lote.zip")
+        with zipfile.ZipFile(compactado, "w") as zf:
+            for i in range(2):
+                zf.write(os.path.join(self.pasta, f"recibo_{i:02d}.pdf"), f"lote/zip_{i:02d}.pdf")
+        recibos, status = self._rodar(workers=1, compactados=True)
+        self.assertEqual(len(recibos), N_RECIBOS + 2)
+        self.assertEqual(status["zip_00.pdf"], "ok")
+
+        cache = ReciboCache(self.caminho_cache)
+        primeira, _ = self._rodar(cache, workers=2, compactados=True)
+        cache = ReciboCache(self.caminho_cache)
+        segunda, status = self._rodar(cache, workers=2, compactados=True)
+        self.assertEqual(segunda, primeira)
+        self.assertEqual(status["zip_01.pdf"], "manifesto")
+
+    def test_compactado_ilegivel(self):
+        with open(os.path.join(self.pasta, "ruim.zip"), "wb") as f:
+            f.write(b"PK nao e zip")
+        # tar.gz cortado no meio do segundo membro: o primeiro ainda e lido.
+        buf = io.BytesIO()
+        with tarfile.open(fileobj=buf, mode="w:gz") as tf:
+            tf.add(os.path.join(self.pasta, "recibo_00.pdf"), "tar_00.pdf")
+            dados = os.urandom(200000)
+            info = tarfile.TarInfo("tar_01.pdf")
+            info.size = len(dados)
+            tf.addfile(info, io.BytesIO(dados))
+        with open(os.path.join(self.pasta, "cortado.tgz"), "wb") as f:
+            f.write(buf.getvalue()[: len(buf.getvalue()) * 3 // 4])
+
+        for rodada in range(2):
+            with self.subTest(rodada=rodada):
+                cache = ReciboCache(self.caminho_cache)
+                falhas = []
+                _, status = self._rodar(cache, workers=2, compactados=True, falhas=falhas)
+                self.assertEqual(status["ruim.zip"], "falha")
+                self.assertEqual(status["tar_01.pdf"], "falha")
+                self.assertEqual(status["cortado.tgz"], "falha")
+                # Compactado com falha nao entra no manifesto: a segunda rodada le de novo.
+                self.assertEqual(status["tar_00.pdf"], "ok" if rodada == 0 else "cache")
+                self.assertIn("ruim.zip", falhas)
+
+
+if __name__ == "__main__":
+    unittest.main()
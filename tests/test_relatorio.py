@@ -0,0 +1,85 @@
+"""
+criar_relatorio_uber output checks, read back with pypdf.
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from pypdf import PdfReader
+
+from pdf.uber_builder import TemaRelatorio, criar_relatorio_uber
+
+ENDERECO_LONGO = (
+    "Avenida Brigadeiro Faria Lima, 3477 - Torre Norte, 14o andar - Itaim Bibi, "
+    "Sao Paulo - SP, 04538-133, entrada pela rua lateral"
+)
+LOGO_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="200" height="80">'
+    '<rect x="5" y="5" width="190" height="70" fill="#123456"/>'
+    '<circle cx="40" cy="40" r="25" fill="#ffcc00"/></svg>'
+)
+
+
+def _recibo(i: int, endereco: str = "Av. Paulista, 1000") -> dict:
+    return {
+        "arquivo": f"r{i}.pdf",
+        "data_texto": "4 de março de 2025",
+        "hora": "14:32",
+        "data_yyyymmdd": f"202503{i % 28 + 1:02d}",
+        "total": 10.0 + i,
+        "preco_viagem": 20.0,
+        "pagamento_linha": "Pix",
+        "categoria": "UberX",
+        "distancia_km": "5.2",
+        "duracao_min": "18",
+        "origem": {"hora": "14:35", "endereco": endereco},
+        "destino": {"hora": "14:53", "endereco": "Av. Paulista, 1000"},
+    }
+
+
+def _texto(pdf: bytes) -> str:
+    # Quebras de linha viram espaco: o endereco pode ter sido quebrado em varias linhas.
+    return " ".join(" ".join(p.extract_text() for p in PdfReader(io.BytesIO(pdf)).pages).split())
+
+
+class RelatorioTest(unittest.TestCase):
+    def test_endereco_longo_nao_e_cortado(self):
+        recibos = [_recibo(i, ENDERECO_LONGO if i % 2 else "Rua Augusta, 100") for i in range(10)]
+        for renderizador in ("platypus", "tabela"):
+            with self.subTest(renderizador=renderizador):
+                texto = _texto(criar_relatorio_uber(recibos, renderizador=renderizador))
+                self.assertEqual(texto.count(f"Origem (14:35): {ENDERECO_LONGO}"), 5)
+                self.assertNotIn("…", texto)
+
+    def test_partes_compartilham_o_logo(self):
+        pasta = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, pasta)
+        caminho_logo = os.path.join(pasta, "logo.svg")
+        with open(caminho_logo, "w") as f:
+            f.write(LOGO_SVG)
+        tema = TemaRelatorio(logo=caminho_logo)
+        recibos = [_recibo(i) for i in range(300)]
+        for renderizador in ("platypus", "tabela", "canvas"):
+            with self.subTest(renderizador=renderizador):
+                pdf = criar_relatorio_uber(
+                    recibos,
+                    tema=tema,
+                    renderizador=renderizador,
+                    logo_em_todas_paginas=True,
+                    workers=3,
+                    recibos_por_parte=100,
+                )
+                formas = []
+                for pagina in PdfReader(io.BytesIO(pdf)).pages:
+                    xobjects = pagina["/Resources"]["/XObject"]
+                    formas.append({xobjects.raw_get(nome).idnum for nome in xobjects})
+                # Todas as paginas (resumo e partes) usam o mesmo form XObject do logo.
+                self.assertEqual(len(set().union(*formas)), 1)
+                self.assertTrue(all(formas))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""
+ReciboTable / ResumoRecibos: columns and single-pass aggregates.
+"""
+
+import unittest
+
+from data.uber_recibo import DicionarioTextos, Recibo
+from data.uber_resumo import ResumoRecibos
+from data.uber_table import ReciboTable
+
+
+def _recibo(data, total, categoria="UberX"):
+    return {"data_yyyymmdd": data, "total": total, "categoria": categoria}
+
+
+class ResumoRecibosTest(unittest.TestCase):
+    def test_virada_de_ano_em_ordem_cronologica(self):
+        # Fora de ordem de proposito: janeiro antes de dezembro na entrada.
+        recibos = [
+            _recibo("20250105", 10.0),
+            _recibo("20241215", 20.0),
+            _recibo("20250130", 5.0),
+            _recibo("20241201", 1.0),
+            _recibo("20241131", 99.0),  # data invalida: conta no total, nao nos periodos
+        ]
+        resumo = ResumoRecibos.from_table(ReciboTable.from_recibos(recibos))
+        self.assertEqual(resumo.meses(), [(202412, 21.0), (202501, 15.0)])
+        self.assertEqual(
+            resumo.semanas(),
+            [(202412, 1, 1.0), (202412, 3, 20.0), (202501, 1, 10.0), (202501, 5, 5.0)],
+        )
+        self.assertEqual(resumo.periodo(), (20241201, 20250130))
+        self.assertEqual(resumo.quantidade, 5)
+        self.assertEqual(resumo.total, 135.0)
+
+    def test_categorias(self):
+        textos = DicionarioTextos()
+        recibos = [
+            _recibo("20250301", 10.0, "UberX"),
+            _recibo("20250302", 30.0, "Comfort"),
+            _recibo("20250303", None, "UberX"),
+            _recibo("20250304", 7.0, None),
+            _recibo("20250305", 5.0, "UberX"),
+        ]
+        resumo = ResumoRecibos.from_table(ReciboTable.from_recibos(recibos, textos))
+        self.assertEqual(resumo.categorias(), [("Comfort", 1, 30.0), ("UberX", 3, 15.0), (None, 1, 7.0)])
+
+    def test_recibo_e_dict_iguais(self):
+        dados = {
+            "arquivo": "r.pdf", "data_texto": None, "hora": None, "data_yyyymmdd": "20250310",
+            "total": 12.5, "preco_viagem": None, "taxa_intermediacao": 1.5, "custo_fixo": None,
+            "promocao": -2.0, "pagamento_linha": "Pix", "categoria": "UberX", "distancia_km": None,
+            "duracao_min": None, "origem": None, "destino": None,
+        }
+        de_dict = ReciboTable.from_recibos([dados])
+        de_recibo = ReciboTable.from_recibos([Recibo.from_dict(dados)])
+        for nome, coluna in de_dict.valores.items():
+            self.assertEqual(str(list(coluna)), str(list(de_recibo.valores[nome])), nome)
+        self.assertEqual(list(de_dict.datas), list(de_recibo.datas))
+        self.assertEqual(list(de_dict.cod_categoria), list(de_recibo.cod_categoria))
+
+
+if __name__ == "__main__":
+    unittest.main()